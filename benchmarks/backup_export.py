@@ -0,0 +1,73 @@
+"""
+Benchmark of exporting every guild: Backup.backup called per guild against Backup.backup_all
+(one ordered read of every table), in this process and with a process pool.
+
+Run from the repository root:
+    python -m benchmarks.backup_export
+"""
+import os
+import time
+import random
+import string
+import sqlite3
+import tempfile
+from functools import partial
+from datetime import datetime, timedelta
+
+from databases import schema
+from databases.backup import Backup, NDJSONBackup
+
+
+def make_database(path: str, guild_count: int, rows_per_guild: int):
+    """Rows are inserted in random guild order like they would be by the bot."""
+    rng = random.Random(0)
+    characters = string.ascii_letters + string.digits
+    now = datetime.now()
+    guild_ids = [10 ** 17 + guild_index for guild_index in range(guild_count)]
+    rows = [guild_id for guild_id in guild_ids for _ in range(rows_per_guild)]
+    rng.shuffle(rows)
+    connection = sqlite3.connect(path)
+    connection.executescript(schema.create_script())
+    connection.executemany("INSERT INTO GUILDS(GUILD_ID, PREFIX) VALUES(?, '!')", ((guild_id,) for guild_id in guild_ids))
+    connection.executemany(
+        "INSERT INTO LICENSED_MEMBERS VALUES(?, ?, ?, 1)",
+        ((member_id, guild_id, str(now + timedelta(seconds=rng.randint(0, 10 ** 7))))
+         for member_id, guild_id in enumerate(rows))
+    )
+    connection.executemany(
+        "INSERT INTO GUILD_LICENSES VALUES(?, ?, 1, ?)",
+        (("".join(rng.choices(characters, k=30)), guild_id, rng.randint(1, 8784)) for guild_id in rows)
+    )
+    connection.commit()
+    connection.close()
+
+
+def backup_each(backup: Backup, file_name: str):
+    guild_ids = [row[0] for row in backup._conn.execute("SELECT GUILD_ID FROM GUILDS")]
+    for guild_id in guild_ids:
+        backup.backup(guild_id, file_name=file_name)
+
+
+def measure(function) -> float:
+    """:return: seconds"""
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for guild_count, rows_per_guild in ((1_000, 50), (10_000, 10)):
+            database = os.path.join(directory, f"main_{guild_count}.sqlite3")
+            make_database(database, guild_count, rows_per_guild)
+            backup = Backup(NDJSONBackup(), database)
+            file_name = os.path.join(directory, "backup")
+            each = measure(partial(backup_each, backup, file_name))
+            single = measure(partial(backup.backup_all, file_name=file_name))
+            pool = measure(partial(backup.backup_all, file_name=file_name, processes=os.cpu_count()))
+            print(f"{guild_count:>6} guilds x {rows_per_guild:>2} rows | backup per guild: {each:6.2f}s"
+                  f" | backup_all: {single:6.2f}s | backup_all {os.cpu_count()} processes: {pool:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of guild backup adapters: time, file size and peak Python memory.
+Compares JSON built in memory (format + save), streamed JSON (save_tables) and gzip NDJSON
+for one guild with many licensed members and licenses.
+
+Run from the repository root:
+    python -m benchmarks.backup_formats
+"""
+import os
+import time
+import random
+import string
+import sqlite3
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+from databases.backup import Backup, BackupAdapter, JSONBackup, NDJSONBackup, SqliteBackup, tables_to_dict
+
+
+def make_database(path: str, row_count: int):
+    rng = random.Random(0)
+    characters = string.ascii_letters + string.digits
+    now = datetime.now()
+    SqliteBackup._create_db_tables(file_name=path)
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO GUILDS(GUILD_ID, PREFIX) VALUES(1, '!')")
+    connection.executemany(
+        "INSERT INTO LICENSED_MEMBERS VALUES(?, 1, ?, ?)",
+        ((member_id, str(now + timedelta(seconds=rng.randint(0, 10 ** 7))), rng.randint(1, 20) * 10 ** 17)
+         for member_id in range(10 ** 17, 10 ** 17 + row_count))
+    )
+    connection.executemany(
+        "INSERT INTO GUILD_LICENSES VALUES(?, 1, ?, ?)",
+        (("".join(rng.choices(characters, k=30)), rng.randint(1, 20) * 10 ** 17, rng.randint(1, 8784))
+         for _ in range(row_count))
+    )
+    connection.commit()
+    connection.close()
+
+
+class InMemoryJSON(JSONBackup):
+    """How backups were saved before streaming, whole file rendered into one string first."""
+
+    def save_tables(self, tables, *, file_name: str) -> None:
+        with open(file_name, "w") as f:
+            f.write(self.format(tables_to_dict(tables)))
+
+
+def run(adapter: BackupAdapter, database: str, directory: str) -> str:
+    """:return: str path of the created backup file"""
+    file_name = os.path.join(directory, "backup")
+    Backup(adapter, database).backup(1, file_name=file_name)
+    return f"{file_name}_1.{adapter.file_extension}"
+
+
+def measure(adapter: BackupAdapter, database: str, directory: str):
+    """
+    Time is measured separately since tracing memory slows everything down.
+    :return: tuple of seconds, file size in bytes and peak traced memory in bytes
+    """
+    start = time.perf_counter()
+    path = run(adapter, database, directory)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run(adapter, database, directory)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    os.remove(path)
+    return elapsed, size, peak
+
+
+def main():
+    adapters = (("json in memory", InMemoryJSON()), ("json streamed", JSONBackup()), ("ndjson.gz", NDJSONBackup()))
+    with tempfile.TemporaryDirectory() as directory:
+        for row_count in (10_000, 100_000):
+            database = os.path.join(directory, f"main_{row_count}.sqlite3")
+            make_database(database, row_count)
+            print(f"{row_count:>7} rows per table")
+            for name, adapter in adapters:
+                elapsed, size, peak = measure(adapter, database, directory)
+                print(f"    {name:<15} | {elapsed * 1000:8.1f}ms | {size / 2 ** 20:7.2f}MiB file"
+                      f" | {peak / 2 ** 20:7.2f}MiB peak memory")
+
+
+if __name__ == "__main__":
+    main()
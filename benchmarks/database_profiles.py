@@ -0,0 +1,85 @@
+"""
+Benchmark of database connection profiles on the redeem and expiry workloads.
+Redeem: license lookup, member lookup, insert of licensed member and license delete (two commits per redeem).
+Expiry: read licensed members in chunks, find expired ones and delete them one by one (commit per delete),
+same queries as the license check loop.
+
+Run from the repository root:
+    python -m benchmarks.database_profiles
+"""
+import time
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+
+from database_handler import DatabaseHandler, CONNECTION_PROFILES
+from helpers.errors import DatabaseMissingData
+from helpers.licence_helper import date_strings_to_timestamps, get_expired_indexes
+
+GUILD_ID = 1
+ROLE_ID = 2
+LICENSED_MEMBER_COUNT = 20_000
+REDEEM_COUNT = 500
+EXPIRED_COUNT = 500
+
+
+async def populate(database: DatabaseHandler):
+    await database.setup_new_guild(GUILD_ID, "!")
+    await database.generate_guild_licenses(REDEEM_COUNT, GUILD_ID, ROLE_ID, 24)
+    now = datetime.now()
+    rows = [
+        (member_id, GUILD_ID, now + timedelta(hours=-1 if member_id < EXPIRED_COUNT else 1000), ROLE_ID)
+        for member_id in range(LICENSED_MEMBER_COUNT)
+    ]
+    await database.connection.executemany(
+        "INSERT INTO LICENSED_MEMBERS(MEMBER_ID, GUILD_ID, EXPIRATION_DATE, LICENSED_ROLE_ID) VALUES(?,?,?,?)", rows
+    )
+    await database.connection.commit()
+
+
+async def redeem_workload(database: DatabaseHandler):
+    licenses = await database.get_guild_licenses(REDEEM_COUNT, GUILD_ID, ROLE_ID)
+    for member_id, (license, _duration) in enumerate(licenses, start=LICENSED_MEMBER_COUNT):
+        await database.get_license_data(license)
+        try:
+            await database.get_member_license_expiration_date(member_id, ROLE_ID)
+        except DatabaseMissingData:
+            # Member doesn't have the role yet, same as in activate_license
+            pass
+        await database.add_new_licensed_member(member_id, GUILD_ID, datetime.now() + timedelta(hours=24), ROLE_ID)
+        await database.delete_license(license)
+
+
+async def expiry_workload(database: DatabaseHandler):
+    expired_rows = []
+    async for rows in database.iter_licensed_member_chunks():
+        expiration_timestamps = date_strings_to_timestamps(row[2] for row in rows)
+        expired_rows.extend(rows[index] for index in get_expired_indexes(expiration_timestamps))
+    for row in expired_rows:
+        await database.delete_licensed_member(row[0], row[3])
+
+
+async def measure(workload, database: DatabaseHandler) -> float:
+    """:return: seconds"""
+    start = time.perf_counter()
+    await workload(database)
+    return time.perf_counter() - start
+
+
+async def main():
+    for profile in CONNECTION_PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            DatabaseHandler.DB_PATH = directory + "/"
+            database = await DatabaseHandler.create_instance(profile=profile)
+            try:
+                await populate(database)
+                redeem = await measure(redeem_workload, database)
+                expiry = await measure(expiry_workload, database)
+            finally:
+                await database.close()
+        print(f"{profile:<12} | {REDEEM_COUNT} redeems: {redeem:6.2f}s ({redeem / REDEEM_COUNT * 1000:5.2f}ms each)"
+              f" | expiry pass, {EXPIRED_COUNT} expired of {LICENSED_MEMBER_COUNT}: {expiry:6.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""
+Benchmark of expiration date conversion for backups on a million rows.
+Compares the old per row strptime conversion against convert_dates for both output formats,
+with fixed offset timezone (fast path) and with a DST timezone (every date parsed).
+10% of the dates have no microseconds (str(datetime) drops them when they're 0), the old way fails on those
+so it's measured on the dates with microseconds only.
+
+Run from the repository root:
+    python -m benchmarks.date_conversion
+"""
+import time
+import random
+from datetime import datetime, timedelta, timezone
+
+from databases.backup import convert_dates
+
+try:
+    from zoneinfo import ZoneInfo
+    DST_TIMEZONE = ZoneInfo("Europe/Zagreb")
+except Exception:
+    # No zoneinfo (Python < 3.9) or no timezone data
+    DST_TIMEZONE = None
+
+ROW_COUNT = 1_000_000
+
+
+def make_dates(count: int):
+    rng = random.Random(0)
+    start = datetime.now()
+    return [
+        str(start + timedelta(seconds=rng.randint(0, 10 ** 8), microseconds=rng.randint(1, 999_999)))
+        if rng.random() > 0.1 else str(start.replace(microsecond=0) + timedelta(seconds=rng.randint(0, 10 ** 8)))
+        for _ in range(count)
+    ]
+
+
+def old_conversion(dates, server_timezone):
+    return [str(datetime.strptime(date, "%Y-%m-%d %H:%M:%S.%f").replace(tzinfo=server_timezone)) for date in dates]
+
+
+def measure(function, *args) -> float:
+    """:return: seconds"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    dates = make_dates(ROW_COUNT)
+    dates_with_microseconds = [date for date in dates if len(date) == 26]
+    fixed_timezone = timezone(timedelta(hours=2))
+    print(f"{ROW_COUNT} dates")
+    old = measure(old_conversion, dates_with_microseconds, fixed_timezone)
+    print(f"    old strptime, {len(dates_with_microseconds)} with microseconds only: {old:6.2f}s")
+    timezones = [("fixed offset", fixed_timezone)]
+    if DST_TIMEZONE is not None:
+        timezones.append((str(DST_TIMEZONE), DST_TIMEZONE))
+    for name, server_timezone in timezones:
+        for date_format in ("iso", "epoch"):
+            elapsed = measure(convert_dates, dates, server_timezone, date_format)
+            print(f"    convert_dates {name:<13} {date_format:<5}: {elapsed:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of embed construction per command.
+Compares success/failure embeds with cached top role colour against the old way (top role resolved
+on every call) and against copying a prebuilt template embed, for a bot member with few and many roles.
+
+Run from the repository root:
+    python -m benchmarks.embed_construction
+"""
+import timeit
+
+from discord import Embed, Colour
+
+from helpers import embed_handler
+
+
+class FakeRole:
+    def __init__(self, position: int, color: Colour):
+        self.position = position
+        self.color = color
+
+    def __lt__(self, other):
+        return self.position < other.position
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+
+class FakeMember:
+    """Resolves top_role same as discord.Member, max over all member roles on every access."""
+
+    def __init__(self, member_id: int, guild: FakeGuild, role_count: int):
+        self.id = member_id
+        self.guild = guild
+        self.roles = [FakeRole(position, Colour(position)) for position in range(role_count)]
+
+    @property
+    def top_role(self):
+        return max(self.roles)
+
+
+def old_success(message: str, member) -> Embed:
+    try:
+        color = member.top_role.color
+        color = Colour.green() if color == Colour.default() else member.top_role.color
+    except AttributeError:
+        color = None
+    return Embed(title="Success", description=message, color=color)
+
+
+_SUCCESS_TEMPLATE = Embed(title="Success", color=Colour.green())
+
+
+def template_copy(message: str, _member) -> Embed:
+    embed = _SUCCESS_TEMPLATE.copy()
+    embed.description = message
+    return embed
+
+
+def measure(function, *args, number: int = 100_000) -> float:
+    """:return: best time per call in microseconds"""
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=3)) / number * 1_000_000
+
+
+def main():
+    message = "Successfully redeemed license for role."
+    for role_count in (3, 50):
+        member = FakeMember(1, FakeGuild(role_count), role_count)
+        print(f"{role_count:>3} roles | success: {measure(embed_handler.success, message, member):5.2f}us"
+              f" | old success: {measure(old_success, message, member):5.2f}us"
+              f" | template copy: {measure(template_copy, message, member):5.2f}us")
+    print(f"          failure: {measure(embed_handler.failure, message):5.2f}us")
+
+
+if __name__ == "__main__":
+    main()
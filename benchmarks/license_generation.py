@@ -0,0 +1,43 @@
+"""
+Micro-benchmark of license generation.
+Compares the bulk CSPRNG generator with the old one (random.choices per key, kept here for reference)
+and measures the format check done before the redeem database lookup.
+
+Run from the repository root:
+    python -m benchmarks.license_generation
+"""
+import time
+import random
+import string
+
+from helpers import licence_helper
+
+
+def old_generate_multiple(amount: int) -> list:
+    licenses = []
+    for _ in range(amount):
+        licenses.append("".join(random.choices(string.ascii_letters + string.digits, k=30)))
+    return licenses
+
+
+def measure(function, *args) -> float:
+    """:return: time in seconds"""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    for amount in (1_000, 100_000, 1_000_000):
+        new = measure(licence_helper.generate_multiple, amount)
+        old = measure(old_generate_multiple, amount)
+        print(f"{amount:>9} keys | new: {new * 1000:8.1f}ms | old: {old * 1000:8.1f}ms | {old / new:4.1f}x faster")
+
+    licenses = licence_helper.generate_multiple(1_000_000)
+    assert len(set(licenses)) == len(licenses)
+    check = measure(lambda: [licence_helper.is_well_formed(license, True) for license in licenses])
+    print(f"Checksum check: {check / len(licenses) * 1_000_000:.2f}us per key, all {len(licenses)} keys unique")
+
+
+if __name__ == "__main__":
+    main()
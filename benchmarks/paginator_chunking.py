@@ -0,0 +1,79 @@
+"""
+Micro-benchmark of Paginator chunking.
+Compares current single pass chunking with the old implementation (kept here for reference)
+on log-like input (many short lines) and on one huge line, at 1 MB and 10 MB.
+
+Run from the repository root:
+    python -m benchmarks.paginator_chunking
+"""
+import sys
+import time
+import random
+import string
+
+from helpers.paginator import Paginator
+
+# Same as what show_log uses
+_MAX_MSG_SIZE = 2000 - len("```DNS\n") - len("```") - len("Last 10000 log lines.\n\n") - 13
+
+
+def old_make_chunks(title, text, separator, max_msg_size):
+    constructed_chunks = []
+    chunk_list = text.split(separator)
+    old_break_long_entries(chunk_list, max_msg_size)
+    temp_chunk = []
+    for entry in chunk_list:
+        if sum(map(len, temp_chunk)) + len(entry) + len(temp_chunk) >= max_msg_size:
+            constructed_chunks.append(title + separator.join(temp_chunk))
+            temp_chunk = [entry]
+        else:
+            temp_chunk.append(entry)
+    constructed_chunks.append(title + separator.join(temp_chunk))
+    return constructed_chunks
+
+
+def old_break_long_entries(chunk_list, max_msg_size):
+    for i, entry in enumerate(chunk_list):
+        if len(entry) >= max_msg_size:
+            f, s = entry[:len(entry)//2], entry[len(entry)//2:]
+            chunk_list[i] = s
+            chunk_list.insert(i, f)
+            old_break_long_entries(chunk_list, max_msg_size)
+
+
+def log_like_input(size: int) -> str:
+    rng = random.Random(0)
+    lines = []
+    total = 0
+    while total < size:
+        line = "".join(rng.choices(string.ascii_letters + " ", k=rng.randint(40, 160)))
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)
+
+
+def single_line_input(size: int) -> str:
+    return "x" * size
+
+
+def measure(function, *args) -> str:
+    start = time.perf_counter()
+    try:
+        chunks = function(*args)
+    except RecursionError:
+        return "RecursionError"
+    return f"{(time.perf_counter() - start) * 1000:9.1f}ms ({len(chunks)} chunks)"
+
+
+def main():
+    sys.setrecursionlimit(1000)
+    for size_name, size in (("1 MB", 1024 ** 2), ("10 MB", 10 * 1024 ** 2)):
+        for input_name, make_input in (("log lines", log_like_input), ("single line", single_line_input)):
+            text = make_input(size)
+            args = ("title\n\n", text, "\n", _MAX_MSG_SIZE)
+            print(f"{size_name:>5} {input_name:<11} | new: {measure(Paginator.make_chunks, *args)}"
+                  f" | old: {measure(old_make_chunks, *args)}")
+
+
+if __name__ == "__main__":
+    main()
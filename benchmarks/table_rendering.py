@@ -0,0 +1,56 @@
+"""
+Micro-benchmark of helpers.table.Table against texttable (what the license commands used before).
+Uses the licenses command layout: 30 char license and integer hours.
+
+Run from the repository root:
+    python -m benchmarks.table_rendering
+"""
+import time
+import random
+import string
+
+import texttable
+
+from helpers.table import Table
+
+
+def make_rows(count: int):
+    rng = random.Random(0)
+    characters = string.ascii_letters + string.digits
+    return [("".join(rng.choices(characters, k=30)), rng.randint(1, 8784)) for _ in range(count)]
+
+
+def render_texttable(rows) -> str:
+    table = texttable.Texttable(max_width=60)
+    table.set_cols_dtype(["t", "t"])
+    table.set_cols_align(["c", "c"])
+    table.add_row(("License", "Duration(h)"))
+    for row in rows:
+        table.add_row(row)
+    return table.draw()
+
+
+def render_table(rows) -> str:
+    return Table(("License", "Duration(h)"), (30, 11)).draw(rows)
+
+
+def measure(function, rows, repeat: int = 3) -> float:
+    """:return: best time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(rows)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    for count in (100, 1_000, 10_000):
+        rows = make_rows(count)
+        new = measure(render_table, rows)
+        old = measure(render_texttable, rows)
+        print(f"{count:>6} rows | Table: {new:8.2f}ms | texttable: {old:9.2f}ms | {old / new:6.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
-import asyncio
 import logging
 import sys
 import traceback
+import importlib.util
 
-import discord
-from discord.ext import commands
+from helpers.startup_profiler import StartupProfiler
 
-from config_handler import ConfigHandler
-from database_handler import DatabaseHandler
-from helpers import embed_handler, logger_handlers
-from helpers.licence_helper import get_current_time
-from helpers.misc import maximize_size
+# Started before any other import so the startup report includes all of them
+startup_profiler = StartupProfiler()
+startup_profiler.start_import_tracking()
+
+import discord  # noqa: E402
+from discord.ext import commands  # noqa: E402
+
+from config_handler import ConfigHandler  # noqa: E402
+from database_handler import DatabaseHandler  # noqa: E402
+from helpers import embed_handler, logger_handlers  # noqa: E402
+from helpers.extension_loader import ExtensionLoader  # noqa: E402
+from helpers.licence_helper import get_current_time  # noqa: E402
+from helpers.misc import maximize_size, invalidate_top_role_color  # noqa: E402
+from helpers.paginator import PaginatorSessionManager  # noqa: E402
+from helpers.shutdown import ShutdownCoordinator  # noqa: E402
 
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.INFO)
@@ -19,60 +28,154 @@ root_logger.addHandler(logger_handlers.get_file_handler())
 logger = logging.getLogger("discord")
 logger.setLevel(logging.WARNING)
 
-startup_extensions = [
-    "licenses",
-    "bot_owner_commands",
-    "guild",
-    "bot_information",
-    "help",
-    "cmd_errors",
+# Extension name -> extensions that have to be loaded before it.
+# Extensions that don't depend on each other are loaded concurrently.
+startup_extensions = {
+    "cmd_errors": (),
+    "guild": (),
+    # Expiry loop removes data of guilds it can't find in bot guilds, it doesn't need guild cog
+    # since it waits for the bot to be ready (guild cache filled) before the first pass.
+    # Note that warm ups (guild database check..) of all cogs run concurrently after everything is loaded.
+    "licenses": (),
+    "bot_owner_commands": (),
+    "bot_information": (),
+    "help": (),
+    "database_backup": (),
     # Removed because a lot of users are asking about the token when they don't even need this cog.
     # If you need it then re-enable it.
-    # "top_gg_api",
-]
+    # "top_gg_api": (),
+}
 
 class Bot(commands.Bot):
     def __init__(self, **kwargs):
         self.config = ConfigHandler("config")
-        self.main_db = asyncio.get_event_loop().run_until_complete(DatabaseHandler.create_instance())  # Define main_db attribute
+        # Created in setup_hook, on the same loop the bot runs on
+        self.main_db = None
         self.up_time_start_time = get_current_time()
+        # Finished tasks remove themselves, runtime (re)loads keep adding warm up tasks
+        self._background_startup_tasks = set()
+        # Set once startup warm up starts, extensions loaded after that are warmed up when loaded
+        self._extension_loader = None
+        self._extensions_warmed_up = False
+        self.shutdown = ShutdownCoordinator()
+        self.previous_shutdown = None
+        self._time_to_ready = None
         intents = discord.Intents.default()
         intents.message_content = True
-        
+
         super().__init__(
             command_prefix=self.prefix_callable,
             help_command=None,
-            description=self.config["bot_description"],
+            description=self.config.settings.bot_description,
             case_insensitive=True,
             intents=intents,
             **kwargs
         )
+        self.paginators = PaginatorSessionManager(self)
+
+    async def setup_hook(self):
+        """
+        Async part of the startup, called by discord.py after login and before connecting to the gateway.
+        Opens the database, starts cache warm up and loads the extensions.
+        Cache and cog warm ups don't block connecting so they run in the background.
+        """
+        self.previous_shutdown = ShutdownCoordinator.load_checkpoint()
+        with startup_profiler.measure("open database"):
+            self.main_db = await DatabaseHandler.create_instance(profile=self.config.settings.database_profile)
+        self._create_background_task(self._warm_caches())
+        self.paginators.start()
+        loader = self._extension_loader = ExtensionLoader(self, startup_extensions, startup_profiler)
+        await loader.load_all()
+        startup_profiler.stop_import_tracking()
+        root_logger.info(startup_profiler.report())
+        self._create_background_task(self._warm_up_extensions(loader))
+
+    def _create_background_task(self, coroutine):
+        task = self.loop.create_task(coroutine)
+        self._background_startup_tasks.add(task)
+        task.add_done_callback(self._background_startup_tasks.discard)
+
+    async def _warm_caches(self):
+        try:
+            with startup_profiler.measure("warm up prefix cache"):
+                prefix_count = await self.main_db.warm_prefix_cache()
+        except Exception as e:
+            # Not fatal, prefixes will be loaded one by one on cache misses
+            root_logger.error(f"Failed to warm up prefix cache: {e}")
+            return
+        root_logger.info(f"Prefix cache warmed up with {prefix_count} guilds.")
+
+    async def _warm_up_extensions(self, loader: ExtensionLoader):
+        self._extensions_warmed_up = True
+        await loader.warm_up()
+        root_logger.info(startup_profiler.timeline_report())
+
+    async def close(self):
+        """
+        Stops accepting commands and drains in-flight work, then closes the connection
+        to Discord so no new events come in and lastly the database.
+        """
+        await self.shutdown.drain()
+        await super().close()
+        for task in list(self._background_startup_tasks):
+            task.cancel()
+        if self.main_db is not None:
+            await self.main_db.close()
+            root_logger.info("Database closed.")
+
+    async def process_commands(self, message):
+        if self.shutdown.shutting_down:
+            return
+        await super().process_commands(message)
 
     async def prefix_callable(self, bot_client, message):
+        default_prefix = self.config.settings.default_prefix
+        # DMs
+        if message.guild is None:
+            return default_prefix
         try:
-            # TODO: Store this in list or something so we don't waste calls to db for each message
             return await bot_client.main_db.get_guild_prefix(message.guild.id)
         except Exception as err:
-            """
-            If fetching prefix from database errors just use the default prefix.
-            This is also used in DMs where the guild is None
-            """
-            default_prefix = self.config["default_prefix"]
-            if message.guild is not None:
-                # Don't spam the log if it's DMs
-                # We only want to log it in case guild prefix is missing
-                root_logger.error(f"Can't get guild {message.guild} prefix. Error:{err}. "
-                                  f"Using '{default_prefix}' as prefix.")
+            # If fetching prefix from database errors just use the default prefix.
+            root_logger.error(f"Can't get guild {message.guild} prefix. Error:{err}. "
+                              f"Using '{default_prefix}' as prefix.")
             return default_prefix
 
-    # ... rest of your code ...
-async def on_ready(self):
-        # Create main_db instance here        # ... rest of your code ...
-    root_logger.info(
-        f"Logged in as: {self.user.name} - {self.user.id}"
-        f"\tDiscordPy version: {discord.__version__}"
-    )
-    root_logger.info("Successfully logged in and booted...!")
+    # Extensions add and remove commands so anything derived from command list (help..) needs to know.
+    # Dispatched as on_extensions_changed.
+    # Extensions (re)loaded at runtime also need their warm up since startup one already ran.
+    async def load_extension(self, name: str, *, package: str = None):
+        await super().load_extension(name, package=package)
+        self.dispatch("extensions_changed")
+        self._warm_up_extension(name, package)
+
+    async def unload_extension(self, name: str, *, package: str = None):
+        await super().unload_extension(name, package=package)
+        self.dispatch("extensions_changed")
+
+    async def reload_extension(self, name: str, *, package: str = None):
+        await super().reload_extension(name, package=package)
+        self.dispatch("extensions_changed")
+        self._warm_up_extension(name, package)
+
+    def _warm_up_extension(self, name: str, package: str = None):
+        """Warms up cogs of extension in background, does nothing during startup (loader warms up everything)."""
+        if not self._extensions_warmed_up:
+            return
+        extension_path = importlib.util.resolve_name(name, package) if name.startswith(".") else name
+        self._create_background_task(self._extension_loader.warm_up(extension_path))
+
+    async def on_ready(self):
+        root_logger.info(
+            f"Logged in as: {self.user.name} - {self.user.id}"
+            f"\tDiscordPy version: {discord.__version__}"
+        )
+        # on_ready can be called multiple times (reconnects) so only the first one counts
+        if self._time_to_ready is None:
+            self._time_to_ready = startup_profiler.elapsed()
+            startup_profiler.mark("ready")
+            root_logger.info(f"Time to ready: {self._time_to_ready:.2f}s")
+        root_logger.info("Successfully logged in and booted...!")
 
     @staticmethod
     async def on_connect():
@@ -80,8 +183,28 @@ async def on_ready(self):
 
     @staticmethod
     async def on_guild_remove(guild):
+        invalidate_top_role_color(guild.id)
         root_logger.info(f"Left guild {guild.name}")
 
+    # Cached embed colours depend on roles so drop them whenever roles change
+    @staticmethod
+    async def on_guild_role_create(role):
+        invalidate_top_role_color(role.guild.id)
+
+    @staticmethod
+    async def on_guild_role_update(before, after):
+        if before.color != after.color or before.position != after.position:
+            invalidate_top_role_color(after.guild.id)
+
+    @staticmethod
+    async def on_guild_role_delete(role):
+        invalidate_top_role_color(role.guild.id)
+
+    @staticmethod
+    async def on_member_update(before, after):
+        if before.roles != after.roles:
+            invalidate_top_role_color(after.guild.id, after.id)
+
     @staticmethod
     async def on_disconnect():
         root_logger.warning("Connection lost")
@@ -98,36 +221,26 @@ async def on_ready(self):
         log_message = f"Uncaught {exc_type} in '{event}': {exc_what}\n{traceback.format_exc()}"
         await self.send_to_log_channel(log_message, title="on_error exception!")
 
-async def send_to_log_channel(self, message: str, *, title: str, ctx=None):
-    """
-    Logs passed message to logger as critical and sends the said message to bot log channel, if one is found.
-    :param message: Message with error/traceback
-    :param title: Title for message
-    :param ctx: optional, if passed will be used to add additional info to message embed footer
-    """
-    root_logger.critical(f"{title}\n{message}")
-    if self.is_ready():
-        log_channel = self.get_channel(self.config["developer_log_channel_id"])
-        embed = embed_handler.simple_embed(maximize_size(message), title, discord.Colour.red())
-        if ctx is not None:
-            guild_id = "DM" if ctx.guild is None else ctx.guild.id
-            footer = f"Guild: {guild_id}    Author: {ctx.author}    Channel: {ctx.channel.id}"
-            embed.set_footer(text=footer)
-        if log_channel is not None:
-            await log_channel.send(embed=embed)
+    async def send_to_log_channel(self, message: str, *, title: str, ctx=None):
+        """
+        Logs passed message to logger as critical and sends the said message to bot log channel, if one is found.
+        :param message: Message with error/traceback
+        :param title: Title for message
+        :param ctx: optional, if passed will be used to add additional info to message embed footer
+        """
+        root_logger.critical(f"{title}\n{message}")
+        if self.is_ready():
+            log_channel = self.get_channel(self.config.settings.developer_log_channel_id)
+            embed = embed_handler.simple_embed(maximize_size(message), title, discord.Colour.red())
+            if ctx is not None:
+                guild_id = "DM" if ctx.guild is None else ctx.guild.id
+                footer = f"Guild: {guild_id}    Author: {ctx.author}    Channel: {ctx.channel.id}"
+                embed.set_footer(text=footer)
+            if log_channel is not None:
+                await log_channel.send(embed=embed)
 
 
 if __name__ == "__main__":
     bot = Bot()
-    root_logger.info("Loaded extensions:")
-    for extension in startup_extensions:
-        cog_path = f"cogs.{extension}"
-        try:
-            bot.load_extension(cog_path)
-            root_logger.info(f"\t{cog_path}")
-        except Exception as e:
-            exc = f"{type(e).__name__}: {e}"
-            root_logger.error(f"{exc} Failed to load extension {cog_path}")
-            traceback_msg = traceback.format_exception(etype=type(e), value=e, tb=e.__traceback__)
-            root_logger.warning(traceback_msg)
-    bot.run(bot.config["token"])
\ No newline at end of file
+    # Logging is already configured above, don't let discord.py add its own handler
+    bot.run(bot.config.settings.token, log_handler=None)
@@ -1,12 +1,13 @@
 import os
 import time
-import psutil
 import logging
 import discord
 from discord.ext import commands, tasks
 from helpers.licence_helper import get_current_time
 from helpers.embed_handler import info, success, failure
-from helpers.misc import construct_load_bar_string, construct_embed, time_ago, embed_space
+from helpers.misc import construct_load_bar_string, construct_embed, time_ago, embed_space, lazy_import
+
+psutil = lazy_import("psutil")
 
 logger = logging.getLogger(__name__)
 
@@ -14,14 +15,27 @@ class BotInformation(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.developers = []
-        # Fetch developers only once, at start
-        self.bot.loop.create_task(self._set_developers())
-        self.process = psutil.Process(os.getpid())
+        # Created on first use so psutil is not imported at startup
+        self._process = None
         self.activity = 0
         self.activity_loop.start()
         self.github_source = "https://github.com/albertopoljak/Licensy"
         self.top_gg_vote_link = "https://discordbots.org/bot/604057722878689324"
 
+    async def warm_up(self):
+        """
+        Called once by the extension loader after all extensions are loaded.
+        Fetch developers only once, at start.
+        """
+        await self._set_developers()
+
+    @property
+    def process(self):
+        """psutil.Process of the bot, kept around since cpu_percent is calculated between calls."""
+        if self._process is None:
+            self._process = psutil.Process(os.getpid())
+        return self._process
+
     @tasks.loop(seconds=300.0)
     async def activity_loop(self):
         if self.activity == 0:
@@ -43,7 +57,7 @@ class BotInformation(commands.Cog):
         # If bot is mentioned in message (both in guild and DM) show its prefix
         if message.mentions and not message.author.bot and self.bot.user in message.mentions:
             if message.guild is None:
-                prefix = self.bot.config["default_prefix"]
+                prefix = self.bot.config.settings.default_prefix
                 msg = f"My prefix here is **{prefix}**"
                 await message.channel.send(embed=info(msg, None))
             else:
@@ -83,7 +97,7 @@ class BotInformation(commands.Cog):
     async def support_server(self, ctx):
         """Shows invite to the support server."""
         description = (
-            f"Join **[support server]({self.bot.config['support_channel_invite']})** "
+            f"Join **[support server]({self.bot.config.settings.support_channel_invite})** "
             f"for questions, suggestions and support."
         )
         await ctx.send(embed=info(description, ctx.me, title="Ask away!"))
@@ -151,7 +165,7 @@ class BotInformation(commands.Cog):
         io_write_bytes = f"{io_counters.write_bytes/1024/1024:.3f}MB"
         footer = (
             f"[Invite]({self._get_bot_invite_link()})"
-            f" | [Support server]({self.bot.config['support_channel_invite']})"
+            f" | [Support server]({self.bot.config.settings.support_channel_invite})"
             f" | [Vote]({self.top_gg_vote_link})"
             f" | [Github]({self.github_source})")
 
@@ -192,7 +206,7 @@ class BotInformation(commands.Cog):
         # Absolutely needed, otherwise we will try to fetch_user
         # before the bot is connected to discord thus getting an exception
         await self.bot.wait_until_ready()
-        developer_ids = self.bot.config["developers"].values()
+        developer_ids = self.bot.config.settings.developers
         developers = []
         for value_id in developer_ids:
             developer = await self.bot.fetch_user(value_id)
@@ -207,5 +221,5 @@ class BotInformation(commands.Cog):
         """Returns humanized last boot time."""
         return time_ago(get_current_time() - self.bot.up_time_start_time)
 
-def setup(bot):
-    bot.add_cog(BotInformation(bot))
\ No newline at end of file
+async def setup(bot):
+    await bot.add_cog(BotInformation(bot))
\ No newline at end of file
@@ -2,10 +2,11 @@ import logging
 import asyncio
 import discord
 from discord.ext import commands
+from config_handler import ConfigValidationError
 from helpers.misc import tail
 from helpers.paginator import Paginator
 from helpers.converters import license_duration
-from helpers.embed_handler import success, failure
+from helpers.embed_handler import success, failure, warning
 from helpers.licence_helper import construct_expiration_date
 
 logger = logging.getLogger(__name__)
@@ -21,7 +22,7 @@ class BotOwnerCommands(commands.Cog):
         """Loads an extension.
         :param extension_path: full path, dotted access.
         """
-        self.bot.load_extension(extension_path)
+        await self.bot.load_extension(extension_path)
         await ctx.send(embed=success(f"{extension_path} loaded.", ctx.me))
 
     @commands.command(hidden=True)
@@ -30,19 +31,20 @@ class BotOwnerCommands(commands.Cog):
         """Unloads an extension.
         :param extension_path: full path, dotted access
         """
-        self.bot.unload_extension(extension_path)
+        await self.bot.unload_extension(extension_path)
         await ctx.send(embed=success(f"{extension_path} unloaded.", ctx.me))
 
     @commands.command(hidden=True)
     @commands.is_owner()
-    async def disconnect(self, _ctx):
-        """Closes database connection and disconnects the bot.
+    async def disconnect(self, ctx, timeout: float = 30.0):
+        """Drains in-flight work, closes database connection and disconnects the bot.
         Used for gracefully shutting it down in need of update.
+        :param timeout: seconds to wait for in-flight work before abandoning it
         """
-        await self.bot.main_db.connection.commit()
-        await self.bot.main_db.connection.close()
-        logger.info("Database closed.")
-        await self.bot.logout()
+        report = await self.bot.shutdown.drain(timeout)
+        await ctx.send(embed=success(f"Shutting down. {report}", ctx.me))
+        # Bot.close also commits and closes the database
+        await self.bot.close()
         logger.info("Disconnected.")
 
     @commands.command(hidden=True)
@@ -98,8 +100,12 @@ class BotOwnerCommands(commands.Cog):
     @commands.command(hidden=True)
     @commands.is_owner()
     async def reload_config(self, ctx):
-        """Reloads json config."""
-        self.bot.config.reload_config()
+        """Reloads json config. Invalid config is rejected and the old one is kept."""
+        try:
+            self.bot.config.reload_config()
+        except ConfigValidationError as e:
+            await ctx.send(embed=failure(f"Config not reloaded, still using the old one.\n{e}"))
+            return
         msg = "Successfully reloaded config."
         logger.info(msg)
         await ctx.send(embed=success(msg, ctx.me))
@@ -143,6 +149,49 @@ class BotOwnerCommands(commands.Cog):
         )
         await ctx.send(embed=success(message, ctx.me))
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def license_filter(self, ctx):
+        """Shows stats of the in-memory filter used to reject invalid licenses without database lookup."""
+        license_filter = self.bot.main_db.license_filter
+        if license_filter is None:
+            await ctx.send(embed=warning("License filter is not built."))
+            return
+        message = (
+            f"Licenses: **{len(license_filter)}** / capacity **{license_filter.capacity}**\n"
+            f"Memory: **{license_filter.memory_bytes / 1024:.1f}KiB**\n"
+            f"False positive rate: **{license_filter.false_positive_rate:.5%}** "
+            f"(target {license_filter.target_false_positive_rate:.3%})"
+        )
+        await ctx.send(embed=success(message, ctx.me))
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def rebuild_license_filter(self, ctx):
+        """
+        Rebuilds license filter from the database.
+        Filter is rebuilt on its own when other connections change the database, this forces it
+        (example to shrink it after many licenses were deleted outside of the bot).
+        """
+        await self.bot.main_db.rebuild_license_filter()
+        license_filter = self.bot.main_db.license_filter
+        await ctx.send(embed=success(f"License filter rebuilt with **{len(license_filter)}** licenses.", ctx.me))
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def database_diagnostic(self, ctx):
+        """Shows connection profile and the SQLite settings currently in effect."""
+        diagnostics = await self.bot.main_db.get_diagnostics()
+        file_size = diagnostics.pop("file_size")
+        wal_size = diagnostics.pop("wal_size")
+        settings = "\n".join(f"{pragma}: **{value}**" for pragma, value in diagnostics.items())
+        message = (
+            f"Profile: **{self.bot.main_db.profile}**\n"
+            f"{settings}\n"
+            f"Size: **{file_size / 2 ** 20:.2f}MiB** (WAL **{wal_size / 2 ** 20:.2f}MiB**)"
+        )
+        await ctx.send(embed=success(message, ctx.me))
+
     @commands.command(hidden=True)
     @commands.is_owner()
     async def guild_diagnostic(self, ctx, guild_id: int = None):
@@ -207,5 +256,5 @@ class BotOwnerCommands(commands.Cog):
         await ctx.send(embed=success("Done", ctx.me))
 
 
-def setup(bot):
-    bot.add_cog(BotOwnerCommands(bot))
\ No newline at end of file
+async def setup(bot):
+    await bot.add_cog(BotOwnerCommands(bot))
\ No newline at end of file
@@ -5,7 +5,7 @@ from asyncio import TimeoutError
 from discord.ext import commands
 from discord.errors import Forbidden
 from helpers.embed_handler import failure
-from helpers.errors import RoleNotFound, DefaultGuildRoleNotSet, DatabaseMissingData
+from helpers.errors import RoleNotFound, DefaultGuildRoleNotSet, DatabaseMissingData, RateLimited
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +83,11 @@ class CmdErrors(commands.Cog):
                 pass
             return
 
+        if isinstance(error, RateLimited):
+            msg = f"{error.message} Please retry in {math.ceil(error.retry_after)}s."
+            await ctx.send(embed=failure(msg))
+            return
+
         if isinstance(error, commands.CheckFailure):
             await ctx.send(embed=failure("You do not have permission to use this command."))
             return
@@ -148,7 +153,7 @@ class CmdErrors(commands.Cog):
         :return: Bool if developer or not.
         """
         # Developers can bypass guild permissions
-        if ctx.message.author.id in self.bot.config["developers"].values():
+        if ctx.message.author.id in self.bot.config.settings.developers:
             # reinvoke() bypasses error handlers so we surround it with try/catch and just
             # send errors to ctx
             try:
@@ -159,5 +164,5 @@ class CmdErrors(commands.Cog):
         else:
             return False
 
-def setup(bot):
-    bot.add_cog(CmdErrors(bot))
\ No newline at end of file
+async def setup(bot):
+    await bot.add_cog(CmdErrors(bot))
\ No newline at end of file
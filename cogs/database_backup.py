@@ -0,0 +1,232 @@
+import time
+import asyncio
+import logging
+import sqlite3
+from pathlib import Path
+from functools import partial
+from contextlib import closing
+from typing import Callable, List, Optional
+
+from discord.ext import commands, tasks
+
+from databases import backup
+from helpers.licence_helper import get_current_time
+from helpers.embed_handler import success, failure, warning
+
+logger = logging.getLogger(__name__)
+
+# SQLITE_BUSY and SQLITE_LOCKED, backup step is retried after them
+_RETRIED_STEP_STATUSES = (5, 6)
+
+
+class SnapshotAborted(Exception):
+    """
+    Raised from snapshot progress callback to stop copying, example when bot is shutting down
+    or when copying keeps restarting because the database is written to.
+    """
+
+
+class SnapshotReport:
+    def __init__(self, path: Path, duration: float, size: int, pages: int, changelog_version: Optional[int] = None):
+        self.path = path
+        self.duration = duration
+        self.size = size
+        self.pages = pages
+        # Set if change tracking of incremental backups is enabled, snapshot works as their base
+        self.changelog_version = changelog_version
+
+    def __str__(self):
+        return (f"{self.path.name}: {self.size / 2 ** 20:.2f}MiB ({self.pages} pages) "
+                f"in {self.duration:.2f}s, integrity ok.")
+
+
+def take_verified_snapshot(source: sqlite3.Connection, destination: Path, *, pages_per_step: int, pause: float,
+                           should_abort: Callable[[], bool], max_restarts: int = 3) -> SnapshotReport:
+    """
+    Blocking, runs in executor.
+    Snapshot is copied to a .partial file first and only renamed to destination once integrity check passes,
+    so unfinished or corrupt copies never look like snapshots.
+    Writes through source connection don't restart the copy, but writes by other connections between the steps
+    (example backup tool merging into the database) restart it from the first page. Restarts are counted and
+    copying is given up once there are more than max_restarts of them.
+    :param source: sqlite3.Connection the bot writes through, see DatabaseHandler.sqlite_connection
+    :param max_restarts: int restarts allowed before giving up
+    :raise: SnapshotAborted if should_abort returned True or there were too many restarts during copying
+    :raise: sqlite3.DatabaseError if integrity check of the copy failed
+    """
+    partial_path = destination.with_name(destination.name + ".partial")
+    pages = 0
+    restarts = 0
+    previous_copied = 0
+
+    def progress(status: int, remaining: int, total: int):
+        nonlocal pages, restarts, previous_copied
+        pages = total
+        # Steps that copied something count copied pages up (writes through source connection can only add pages),
+        # copied count not going up means the copy started over. Busy/locked steps copy nothing and are retried.
+        if status not in _RETRIED_STEP_STATUSES:
+            copied = total - remaining
+            if copied <= previous_copied:
+                restarts += 1
+                if restarts > max_restarts:
+                    raise SnapshotAborted(f"Snapshot restarted {restarts} times because database was written to "
+                                          f"during copying, giving up.")
+            previous_copied = copied
+        if should_abort():
+            raise SnapshotAborted("Snapshot aborted.")
+
+    start = time.perf_counter()
+    try:
+        backup.snapshot_connection(source, str(partial_path), pages_per_step=pages_per_step, progress=progress,
+                                   pause=pause)
+        with closing(sqlite3.connect(partial_path)) as connection:
+            problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+        if problems != ["ok"]:
+            raise sqlite3.DatabaseError(f"Integrity check of snapshot failed: {'; '.join(problems[:10])}")
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+    partial_path.replace(destination)
+    return SnapshotReport(destination, time.perf_counter() - start, destination.stat().st_size, pages,
+                          backup.snapshot_changelog_version(str(destination)))
+
+
+class DatabaseBackup(commands.Cog):
+    """
+    Takes periodic online snapshots of the database while the bot is running.
+    Copying is done in executor in small steps with pauses between them so the database is locked
+    only for short moments and disk is not saturated, event loop and expiry loop keep running normally.
+    Copy goes through the bot's own connection so the bot's writes between the steps don't restart it.
+    """
+    SNAPSHOT_PREFIX = "snapshot_"
+    SNAPSHOT_SUFFIX = ".sqlite3"
+    # 256 pages is 1MiB with default page size, with the pause that's at most ~20MiB/s
+    PAGES_PER_STEP = 256
+    STEP_PAUSE = 0.05
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.last_report: Optional[SnapshotReport] = None
+        self._lock = asyncio.Lock()
+        self._abort = False
+        if self.bot.config.settings.backup_interval_hours > 0:
+            self.snapshot_loop.start()
+
+    def cog_unload(self):
+        self._abort = True
+        self.snapshot_loop.cancel()
+
+    @property
+    def directory(self) -> Path:
+        return Path(self.bot.config.settings.backup_directory)
+
+    @tasks.loop(minutes=30.0)
+    async def snapshot_loop(self):
+        """
+        Checks often and takes a snapshot only when the newest one is older than the interval,
+        that way restarting the bot doesn't reset or skip the schedule.
+        """
+        if self.bot.shutdown.shutting_down or self._lock.locked():
+            return
+        snapshots = self.get_snapshots()
+        interval = self.bot.config.settings.backup_interval_hours * 3600
+        if snapshots and time.time() - snapshots[-1].stat().st_mtime < interval:
+            return
+        try:
+            await self.take_snapshot()
+        except SnapshotAborted as e:
+            logger.warning(f"Scheduled snapshot aborted: {e}")
+        except Exception as e:
+            logger.critical(f"Scheduled snapshot failed: {type(e).__name__}: {e}")
+
+    @snapshot_loop.before_loop
+    async def before_snapshot_loop(self):
+        logger.info("Starting snapshot loop..")
+        await self.bot.wait_until_ready()
+        logger.info("Snapshot loop started!")
+
+    def get_snapshots(self) -> List[Path]:
+        """:return: list of snapshot paths, oldest first (names contain sortable timestamp)"""
+        return sorted(self.directory.glob(f"{self.SNAPSHOT_PREFIX}*{self.SNAPSHOT_SUFFIX}"))
+
+    async def take_snapshot(self) -> SnapshotReport:
+        """
+        Takes verified snapshot and removes snapshots over the retention count.
+        :raise: SnapshotAborted if bot started shutting down during copying
+        :raise: sqlite3.DatabaseError if integrity check of the copy failed
+        """
+        async with self._lock:
+            with self.bot.shutdown.track("snapshot", on_shutdown=self._request_abort):
+                self._abort = False
+                self.directory.mkdir(parents=True, exist_ok=True)
+                source = self.bot.main_db.sqlite_connection
+                destination = self.directory / (
+                    f"{self.SNAPSHOT_PREFIX}{get_current_time():%Y%m%d_%H%M%S}{self.SNAPSHOT_SUFFIX}"
+                )
+                report = await asyncio.get_running_loop().run_in_executor(None, partial(
+                    take_verified_snapshot, source, destination,
+                    pages_per_step=self.PAGES_PER_STEP, pause=self.STEP_PAUSE, should_abort=lambda: self._abort
+                ))
+            self.last_report = report
+            logger.info(f"Snapshot taken. {report}")
+            await self._prune_changelog(report)
+            self._rotate()
+            return report
+
+    async def _prune_changelog(self, report: SnapshotReport):
+        """
+        Snapshot is a base of incremental backups, changes it already contains are removed from the changelog
+        so it doesn't grow forever when base is never taken with the backup tool.
+        """
+        if report.changelog_version is None:
+            return
+        try:
+            await self.bot.main_db.update_database(backup.PRUNE_CHANGELOG_QUERY, report.changelog_version)
+        except Exception as e:
+            logger.error(f"Can't prune changelog up to version {report.changelog_version}: {e}")
+
+    def _request_abort(self):
+        self._abort = True
+
+    def _rotate(self):
+        retention_count = max(self.bot.config.settings.backup_retention_count, 1)
+        for path in self.get_snapshots()[:-retention_count]:
+            try:
+                path.unlink()
+                logger.info(f"Removed old snapshot {path.name}")
+            except OSError as e:
+                logger.error(f"Can't remove old snapshot {path.name}: {e}")
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def snapshot(self, ctx):
+        """Takes database snapshot now, same as scheduled ones."""
+        if self._lock.locked():
+            await ctx.send(embed=warning("Snapshot is already in progress."))
+            return
+        try:
+            report = await self.take_snapshot()
+        except (SnapshotAborted, sqlite3.Error, OSError) as e:
+            await ctx.send(embed=failure(f"Snapshot failed: {e}"))
+            return
+        await ctx.send(embed=success(f"Snapshot taken. {report}", ctx.me))
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def snapshot_status(self, ctx):
+        """Shows last snapshot metrics and stored snapshots."""
+        settings = self.bot.config.settings
+        snapshots = self.get_snapshots()
+        schedule = (f"every **{settings.backup_interval_hours}h**" if settings.backup_interval_hours > 0
+                    else "**disabled**")
+        message = (
+            f"Schedule: {schedule}, keeping **{settings.backup_retention_count}**\n"
+            f"Stored: **{len(snapshots)}** using **{sum(path.stat().st_size for path in snapshots) / 2 ** 20:.2f}MiB**"
+            f" in `{self.directory}`\n"
+            f"Last snapshot this run: {self.last_report or 'none'}"
+        )
+        await ctx.send(embed=success(message, ctx.me))
+
+
+async def setup(bot):
+    await bot.add_cog(DatabaseBackup(bot))
@@ -9,7 +9,10 @@ logger = logging.getLogger(__name__)
 class Guild(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.bot.loop.create_task(self.startup_guild_database_check())
+
+    async def warm_up(self):
+        """Called once by the extension loader after all extensions are loaded."""
+        await self.startup_guild_database_check()
 
     async def startup_guild_database_check(self):
         db_guilds_ids = await self.bot.main_db.get_all_guild_ids()
@@ -21,7 +24,7 @@ class Guild(commands.Cog):
             if guild.id not in db_guilds_ids:
                 logger.info(f"Guild {guild.id} {guild} found but not registered. "
                             f"Adding entry to database.")
-                await self.bot.main_db.setup_new_guild(guild.id, self.bot.config["default_prefix"])
+                await self.bot.main_db.setup_new_guild(guild.id, self.bot.config.settings.default_prefix)
 
         # Do not code the other way around
         # aka deleting database data if the guild in database doesn't exist in bot guilds
@@ -131,5 +134,5 @@ class Guild(commands.Cog):
         )
         await ctx.send(embed=success(msg, ctx.me))
 
-def setup(bot):
-    bot.add_cog(Guild(bot))
\ No newline at end of file
+async def setup(bot):
+    await bot.add_cog(Guild(bot))
\ No newline at end of file
@@ -1,4 +1,6 @@
 import logging
+import itertools
+from typing import Dict, List, Tuple
 import discord
 from discord.ext import commands
 from helpers.embed_handler import info
@@ -16,11 +18,40 @@ class PrettyHelpCommand(commands.MinimalHelpCommand):
     Calling it in guild will hide the commands that you have no access too.
     Calling it in DMs will show you all commands.
     Hidden commands are always hidden.
+
+    Command list only depends on the permission profile (see get_permission_profile) so it's rendered
+    once per profile and cached in the Help cog until extensions are loaded/unloaded.
     """
 
+    def __init__(self, **options):
+        # None means checks are verified in guilds but not in DMs
+        options.setdefault("verify_checks", None)
+        super().__init__(**options)
+
+    async def get_permission_profile(self) -> Tuple:
+        """
+        Commands shown in help depend only on checks that can fail for the invoker.
+        Non hidden commands use only guild_only, is_owner, has_permissions and bot_has_permissions(manage_roles)
+        checks so this is all that can change the output.
+        If you add a non hidden command with a different check add what it checks here too.
+        :return: tuple hashable profile, same profile always results in the same command list
+        """
+        ctx = self.context
+        if ctx.guild is None:
+            return ("dm",)
+        author_permissions = ctx.permissions
+        return (
+            "guild",
+            author_permissions.administrator,
+            author_permissions.manage_roles,
+            ctx.bot_permissions.manage_roles,
+            # Owner ids are fetched once and then cached by the bot
+            await ctx.bot.is_owner(ctx.author)
+        )
+
     def get_ending_note(self):
         command_name = self.invoked_with
-        return "Type {0}{1} <command> for more info on a command.\n".format(self.clean_prefix, command_name)
+        return "Type {0}{1} <command> for more info on a command.\n".format(self.context.clean_prefix, command_name)
 
     def get_opening_note(self):
         prefix = "If you like the bot please consider donating or starring the Github repository, ty :)"
@@ -29,13 +60,35 @@ class PrettyHelpCommand(commands.MinimalHelpCommand):
         else:
             return prefix + "\nCommands that you have no permission for are **hidden**:"
 
+    def get_bot_commands_lines(self, commands, heading) -> List[str]:
+        if not commands:
+            return []
+        max_length = 19
+        outputs = [f"`  {c.name}{embed_space * (max_length - len(c.name))}{c.short_doc}`" for c in commands]
+        return [f"\n**__{heading}__**", "\n".join(outputs)]
+
     def add_bot_commands_formatting(self, commands, heading):
-        if commands:
-            max_length = 19
-            outputs = [f"`  {c.name}{embed_space * (max_length - len(c.name))}{c.short_doc}`" for c in commands]
-            joined = "\n".join(outputs)
-            self.paginator.add_line(f"\n**__{heading}__**")
-            self.paginator.add_line(joined)
+        for line in self.get_bot_commands_lines(commands, heading):
+            self.paginator.add_line(line)
+
+    async def render_command_list(self, bot_commands) -> List[str]:
+        """
+        Runs the checks of the commands and formats the ones that passed, grouped by category.
+        :param bot_commands: iterable of commands to list
+        :return: list of lines to add to paginator
+        """
+        no_category = f"\u200b{self.no_category}"
+
+        def get_category(command):
+            return command.cog.qualified_name if command.cog is not None else no_category
+
+        filtered = await self.filter_commands(bot_commands, sort=True, key=get_category)
+        lines = []
+        for category, category_commands in itertools.groupby(filtered, key=get_category):
+            if self.sort_commands:
+                category_commands = sorted(category_commands, key=lambda c: c.name)
+            lines.extend(self.get_bot_commands_lines(list(category_commands), category))
+        return lines
 
     async def send_pages(self):
         destination = self.get_destination()
@@ -45,20 +98,41 @@ class PrettyHelpCommand(commands.MinimalHelpCommand):
 
     async def send_bot_help(self, mapping):
         ctx = self.context
-        # I want to verify_checks if it's called in guild but don't want it in DMs
-        if ctx.guild is None:
-            # Temporally disable verify checks then enable them again (alternative would be a lot of DRY breaking).
-            self.verify_checks = False
-            await super().send_bot_help(mapping)
-            self.verify_checks = True
-        else:
-            await super().send_bot_help(mapping)
+        help_cog = self.cog
+        profile = await self.get_permission_profile()
+        command_lines = help_cog.help_cache.get(profile)
+        if command_lines is None:
+            generation = help_cog.help_cache_generation
+            command_lines = await self.render_command_list(itertools.chain.from_iterable(mapping.values()))
+            # Don't cache if extensions changed while checks were running as the result might be stale
+            if generation == help_cog.help_cache_generation:
+                help_cog.help_cache[profile] = command_lines
+
+        if ctx.bot.description:
+            self.paginator.add_line(ctx.bot.description, empty=True)
+
+        note = self.get_opening_note()
+        if note:
+            self.paginator.add_line(note, empty=True)
+
+        for line in command_lines:
+            self.paginator.add_line(line)
+
+        note = self.get_ending_note()
+        if note:
+            self.paginator.add_line()
+            self.paginator.add_line(note)
+
+        await self.send_pages()
 
 
 class Help(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._original_help_command = bot.help_command
+        # Permission profile -> rendered help command list lines, see PrettyHelpCommand.get_permission_profile
+        self.help_cache: Dict[Tuple, List[str]] = {}
+        self.help_cache_generation = 0
         bot.help_command = PrettyHelpCommand()
         bot.help_command.cog = self
         self.github_faq = "https://github.com/albertopoljak/Licensy/wiki/FAQ"
@@ -69,6 +143,15 @@ class Help(commands.Cog):
         """Revert to default help command in case cog is unloaded."""
         self.bot.help_command = self._original_help_command
 
+    def clear_help_cache(self):
+        self.help_cache.clear()
+        self.help_cache_generation += 1
+
+    @commands.Cog.listener()
+    async def on_extensions_changed(self):
+        """Custom event dispatched by bot when extension is loaded, unloaded or reloaded."""
+        self.clear_help_cache()
+
     @commands.command()
     async def faq(self, ctx):
         """Show common Q/A about bot and its usage."""
@@ -85,5 +168,5 @@ class Help(commands.Cog):
         description = f"See Github [quickstart link]({self.github_bot_quick_start})."
         await ctx.send(embed=info(description, ctx.me, title="Quickstart :)"))
 
-def setup(bot):
-    bot.add_cog(Help(bot))
\ No newline at end of file
+async def setup(bot):
+    await bot.add_cog(Help(bot))
\ No newline at end of file
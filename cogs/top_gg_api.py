@@ -8,7 +8,7 @@ class TopGGApi(commands.Cog):
     """Handles interactions with the top.gg API"""
     def __init__(self, bot):
         self.bot = bot
-        self.dbl_client = dbl.DBLClient(self.bot, self.bot.config["top_gg_api_key"])
+        self.dbl_client = dbl.DBLClient(self.bot, self.bot.config.settings.top_gg_api_key)
         self.update_stats_loop.start()
 
     @tasks.loop(hours=12.0)
@@ -26,5 +26,5 @@ class TopGGApi(commands.Cog):
         await self.bot.wait_until_ready()
         logger.info("Update stats loop started!")
 
-def setup(bot):
-    bot.add_cog(TopGGApi(bot))
\ No newline at end of file
+async def setup(bot):
+    await bot.add_cog(TopGGApi(bot))
\ No newline at end of file
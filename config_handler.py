@@ -1,24 +1,131 @@
 import json
 import logging
 from pathlib import Path
+from typing import FrozenSet
+from dataclasses import dataclass, fields, MISSING
 
 
 logger = logging.getLogger(__name__)
 
 
+class ConfigValidationError(ValueError):
+    """Raised when the json config does not match the BotConfig schema."""
+
+
+@dataclass(frozen=True, slots=True)
+class BotConfig:
+    """
+    Validated and coerced config values.
+    Built once when the config is (re)loaded so the rest of the bot can use attribute access
+    instead of string keys, meaning typos are caught by linters instead of at runtime.
+    """
+    token: str
+    bot_description: str
+    default_prefix: str
+    developer_log_channel_id: int
+    developers: FrozenSet[int]
+    maximum_unused_guild_licences: int
+    support_channel_invite: str
+    top_gg_api_key: str = ""
+    # Reject licenses without valid checksum before database lookup, enable only once all licenses
+    # generated before checksums were added are used up.
+    require_license_checksum: bool = False
+    # Periodic online snapshots of the database, 0 hours disables them.
+    backup_interval_hours: int = 24
+    backup_retention_count: int = 7
+    backup_directory: str = "databases/snapshots"
+    # SQLite connection profile, one of database_handler.CONNECTION_PROFILES: default, wal, wal_durable
+    database_profile: str = "wal"
+
+
+def _coerce_str(value) -> str:
+    if not isinstance(value, str):
+        raise TypeError(f"expected string, got {type(value).__name__}")
+    return value
+
+
+def _coerce_int(value) -> int:
+    # bool is a subclass of int but True/False as an ID or limit is always a mistake
+    if isinstance(value, bool):
+        raise TypeError("expected integer, got bool")
+    return int(value)
+
+
+def _coerce_bool(value) -> bool:
+    if not isinstance(value, bool):
+        raise TypeError(f"expected true or false, got {type(value).__name__}")
+    return value
+
+
+def _coerce_id_set(value) -> FrozenSet[int]:
+    """
+    Developers are stored as {"name": id} in json, but we only ever need
+    the ids for membership tests so they're kept as frozenset.
+    """
+    if isinstance(value, dict):
+        value = value.values()
+    elif not isinstance(value, list):
+        raise TypeError(f"expected dict or list of ids, got {type(value).__name__}")
+    return frozenset(_coerce_int(user_id) for user_id in value)
+
+
+_COERCERS = {
+    str: _coerce_str,
+    int: _coerce_int,
+    bool: _coerce_bool,
+    FrozenSet[int]: _coerce_id_set,
+}
+
+# Precompiled schema: (key, coercer, default) for every BotConfig field
+_SCHEMA = tuple((field.name, _COERCERS[field.type], field.default) for field in fields(BotConfig))
+
+
+def parse_config(data: dict) -> BotConfig:
+    """
+    Validates and coerces raw json config data to BotConfig.
+    All errors are collected so one reload shows every broken key at once.
+    :param data: dict loaded json data
+    :return: BotConfig
+    :raise: ConfigValidationError if any key is missing or can't be coerced to its type
+    """
+    if not isinstance(data, dict):
+        raise ConfigValidationError("Config root has to be a json object.")
+
+    values = {}
+    errors = []
+    for key, coercer, default in _SCHEMA:
+        if key not in data:
+            if default is MISSING:
+                errors.append(f"missing key '{key}'")
+            else:
+                values[key] = default
+            continue
+        try:
+            values[key] = coercer(data[key])
+        except (TypeError, ValueError) as e:
+            errors.append(f"invalid value for '{key}': {e}")
+
+    if errors:
+        raise ConfigValidationError("Invalid json config: " + "; ".join(errors))
+    return BotConfig(**values)
+
+
 class ConfigHandler:
     """
     Class that handles interaction with config json files.
-    Values can be accessed with bracket notation self[key]
+    Values can be accessed with bracket notation self[key] (raw json values)
+    or with attribute access on self.settings (validated BotConfig).
     """
     CONFIG_DIR = Path("")
 
     def __init__(self, config_name: str):
         """
         :param config_name: name of the config file without the suffix.
+        :raise: ConfigValidationError if the config is invalid, bot can't run without valid config.
         """
         self._path = ConfigHandler.CONFIG_DIR / (config_name + ".json")
         self._config = self._load_config()
+        self.settings = parse_config(self._config)
 
     def __repr__(self):
         return f"{json.dumps(self._config, indent=4, sort_keys=True)}"
@@ -27,27 +134,37 @@ class ConfigHandler:
         """
         Loads config and checks fo validity of json file.
         :return: dict loaded json data
+        :raise: ConfigValidationError if the file can't be loaded
         """
         try:
             with open(self._path) as cfg:
                 data = json.load(cfg)
                 return data
         except FileNotFoundError as e:
-            logger.critical(f"Config json file was not found: {self._path} : {e}")
+            message = f"Config json file was not found: {self._path} : {e}"
         except ValueError as e:
-            logger.critical(f"Invalid config json: {e}")
-        except KeyError as e:
-            logger.critical(f"Invalid json config configuration: {e}")
+            message = f"Invalid config json: {e}"
         except Exception as e:
-            logger.critical(f"Can't load json config: {e}")
+            message = f"Can't load json config: {e}"
+        logger.critical(message)
+        raise ConfigValidationError(message)
 
     def reload_config(self):
         """
         Reloads config.
         If you change the config manually while the bot is running you need to call this method
         so the values are updated in memory.
+        If the new config is invalid it is rejected and the last good config stays in use.
+        :raise: ConfigValidationError if the new config is invalid
         """
-        self._config = self._load_config()
+        data = self._load_config()
+        try:
+            settings = parse_config(data)
+        except ConfigValidationError as e:
+            logger.critical(f"Rejected config reload, keeping last good config. {e}")
+            raise
+        self._config = data
+        self.settings = settings
 
     def __getitem__(self, key: str):
         return self._get_key(key)
@@ -61,11 +178,26 @@ class ConfigHandler:
             raise KeyError(error_message)
 
     def update_key(self, key: str, value):
+        """
+        Updates key both in memory and in the json file.
+        The update is validated first, invalid values are not saved.
+        """
+        new_config = {**self._config, key: value}
+        try:
+            settings = parse_config(new_config)
+        except ConfigValidationError as e:
+            logger.critical(f"Unable to update json key {key} to value {value}: {e}")
+            return
+
         try:
-            self._config[key] = value
             with open(self._path, "w") as cfg:
-                json.dump(self._config, cfg, indent=4, sort_keys=True)
+                json.dump(new_config, cfg, indent=4, sort_keys=True)
         except TypeError as e:
             logger.critical(f"Unable to serialize the object {e}")
+            return
         except Exception as e:
             logger.critical(f"Unable to update json key {key} to value {value}: {e}")
+            return
+
+        self._config = new_config
+        self.settings = settings
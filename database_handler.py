@@ -1,38 +1,105 @@
 import logging
+import sqlite3
 import aiosqlite
 from pathlib import Path
 from datetime import datetime
-from typing import Tuple, List, Union
+from typing import AsyncIterator, Dict, Tuple, List, Union
 
 from helpers import misc
 from helpers import licence_helper
+from helpers.bloom_filter import BloomFilter
 from helpers.errors import DefaultGuildRoleNotSet, DatabaseMissingData
+from databases import schema
 
 
 logger = logging.getLogger(__name__)
 
+# Minimum license filter capacity, filter is rebuilt with double the stored licenses once it's full
+_LICENSE_FILTER_MIN_CAPACITY = 10_000
+
+# Profile name -> PRAGMAs applied to every connection, selected with database_profile config key.
+# Every profile sets every PRAGMA since journal_mode is stored in the database file and would otherwise
+# stay from the previously used profile.
+CONNECTION_PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit, ~2MB page cache, no mmap
+    "default": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    # Readers don't block the writer and commits don't wait for fsync (checkpoints do).
+    # Database can't get corrupted but power loss can lose the last few commits.
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 2 ** 20,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # Same as wal but every commit is durable, for hosts that lose power
+    "wal_durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 2 ** 20,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+# SQLite reports these as numbers
+_PRAGMA_VALUE_NAMES = {
+    "synchronous": {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"},
+    "temp_store": {0: "DEFAULT", 1: "FILE", 2: "MEMORY"},
+}
+
 
 class DatabaseHandler:
     DB_PATH = "databases/"
     DB_EXTENSION = ".sqlite3"
 
     @classmethod
-    async def create_instance(cls, db_name: str = "main"):
+    async def create_instance(cls, db_name: str = "main", profile: str = "wal"):
         """"
         Can't use await in __init__ so we create a factory pattern.
         To correctly create this object you need to call :
             await DatabaseHandler.create_instance()
 
+        :param profile: str name of connection profile from CONNECTION_PROFILES
+        :raise: ValueError if profile doesn't exist
         """
+        if profile not in CONNECTION_PROFILES:
+            raise ValueError(f"Unknown database profile '{profile}', use one of: {', '.join(CONNECTION_PROFILES)}")
         self = DatabaseHandler()
         self.db_name = db_name
+        self.profile = profile
         self.connection = await self._get_connection()
         logger.info("Connection to database established.")
+        await self.rebuild_license_filter()
         return self
 
     def __init__(self):
         self.db_name = None
+        self.profile = None
         self.connection = None
+        # guild_id -> prefix, prefix is needed for every message so it's cached.
+        # Filled by warm_prefix_cache and on cache misses, kept in sync by methods that change GUILDS table.
+        self._prefix_cache = {}
+        # Negative cache for license lookups, licenses not in it are rejected without a query.
+        # Has to contain every stored license so every insert to GUILD_LICENSES has to add to it.
+        # Inserts by other connections (backup merge, manual SQL..) are detected with data_version.
+        self.license_filter = None
+        self._license_filter_data_version = None
+        self._license_filter_stale_count = 0
+        self._licenses_added_during_rebuild = None
+
+    async def close(self):
+        """Commits any pending changes and closes the connection."""
+        await self.connection.commit()
+        await self.connection.close()
 
     async def _get_connection(self) -> aiosqlite.core.Connection:
         """
@@ -41,12 +108,49 @@ class DatabaseHandler:
         """
         path = DatabaseHandler._construct_path(self.db_name)
         if Path(path).is_file():
-            conn = await aiosqlite.connect(path)
-            return conn
+            conn = await DatabaseHandler._connect(path)
         else:
             logger.warning("Database not found! Creating fresh ...")
             misc.check_create_directory(DatabaseHandler.DB_PATH)
-            return await DatabaseHandler._create_database(path)
+            conn = await DatabaseHandler._create_database(path)
+        await self._apply_profile(conn)
+        await DatabaseHandler._create_indexes(conn)
+        return conn
+
+    async def _apply_profile(self, conn: aiosqlite.core.Connection):
+        for pragma, value in CONNECTION_PROFILES[self.profile].items():
+            await conn.execute(f"PRAGMA {pragma}={value}")
+
+    async def get_diagnostics(self) -> Dict[str, Union[int, str]]:
+        """
+        :return: dict PRAGMA name -> value currently in effect for the connection (not the configured ones),
+                 plus database size and WAL size.
+        """
+        diagnostics = {}
+        for pragma in (*CONNECTION_PROFILES[self.profile], "page_size", "page_count", "freelist_count"):
+            async with self.connection.execute(f"PRAGMA {pragma}") as cursor:
+                row = await cursor.fetchone()
+                value = row[0] if row is not None else None
+                diagnostics[pragma] = _PRAGMA_VALUE_NAMES.get(pragma, {}).get(value, value)
+        path = Path(DatabaseHandler._construct_path(self.db_name))
+        diagnostics["file_size"] = path.stat().st_size
+        wal_path = path.with_name(path.name + "-wal")
+        diagnostics["wal_size"] = wal_path.stat().st_size if wal_path.is_file() else 0
+        return diagnostics
+
+    @property
+    def sqlite_connection(self) -> sqlite3.Connection:
+        """
+        Underlying sqlite3 connection, for APIs that have to run outside of the aiosqlite thread.
+        Snapshots copy through it so the bot's writes don't restart them, see DatabaseBackup.
+        """
+        return self.connection._conn
+
+    @staticmethod
+    async def _connect(path: str) -> aiosqlite.core.Connection:
+        # Not bound to aiosqlite thread so sqlite_connection can be used from executor threads,
+        # SQLite itself serializes access to the connection.
+        return await aiosqlite.connect(path, check_same_thread=False)
 
     @staticmethod
     def _construct_path(db_name: str) -> str:
@@ -58,41 +162,23 @@ class DatabaseHandler:
         :param path: path where database will be created, including file name and extension
         :return: aiosqlite.core.Connection
         """
-        conn = await aiosqlite.connect(path)
-        await conn.execute("CREATE TABLE GUILDS "
-                           "("
-                           "GUILD_ID TEXT PRIMARY KEY, "
-                           "PREFIX TEXT CHECK(PREFIX IS NULL OR LENGTH(PREFIX) <= 5), "
-                           "ENABLE_LOG_CHANNEL TINYINT DEFAULT 0, "
-                           "LOG_CHANNEL_ID TEXT, "
-                           "DEFAULT_LICENSE_ROLE_ID TEXT, "
-                           "DEFAULT_LICENSE_DURATION_HOURS UNSIGNED BIG INT DEFAULT 720"
-                           ")"
-                           )
-
-        await conn.execute("CREATE TABLE LICENSED_MEMBERS "
-                           "("
-                           "MEMBER_ID TEXT, "
-                           "GUILD_ID TEXT, "
-                           "EXPIRATION_DATE DATE, "
-                           "LICENSED_ROLE_ID TEXT, "
-                           "UNIQUE(MEMBER_ID, LICENSED_ROLE_ID)"
-                           ")"
-                           )
-
-        await conn.execute("CREATE TABLE GUILD_LICENSES "
-                           "("
-                           "LICENSE TEXT PRIMARY KEY, "
-                           "GUILD_ID TEXT, "
-                           "LICENSED_ROLE_ID TEXT, "
-                           "LICENSE_DURATION_HOURS UNSIGNED BIG INT"
-                           ")"
-                           )
-
+        conn = await DatabaseHandler._connect(path)
+        for create_table in schema.TABLES.values():
+            await conn.execute(create_table)
         await conn.commit()
         logger.info("Database successfully created!")
         return conn
 
+    @staticmethod
+    async def _create_indexes(conn: aiosqlite.core.Connection):
+        """
+        Indexes used by keyset paginated queries (they're also used by queries filtering by guild).
+        Created at every connect so existing databases get them too.
+        """
+        for create_index in schema.INDEXES:
+            await conn.execute(create_index)
+        await conn.commit()
+
     async def update_database(self, query: str, *args):
         await self.connection.execute(query, args)
         await self.connection.commit()
@@ -101,12 +187,30 @@ class DatabaseHandler:
     async def setup_new_guild(self, guild_id: int, default_prefix: str):
         insert_guild_query = "INSERT INTO GUILDS(GUILD_ID, PREFIX) VALUES(?,?)"
         await self.update_database(insert_guild_query, guild_id, default_prefix)
+        self._prefix_cache[guild_id] = default_prefix
 
     async def get_guild_prefix(self, guild_id: int) -> str:
+        try:
+            return self._prefix_cache[guild_id]
+        except KeyError:
+            pass
         query = "SELECT PREFIX FROM GUILDS WHERE GUILD_ID=?"
         async with self.connection.execute(query, (guild_id,)) as cursor:
             row = await cursor.fetchone()
-            return row[0]
+            prefix = row[0]
+        self._prefix_cache[guild_id] = prefix
+        return prefix
+
+    async def warm_prefix_cache(self) -> int:
+        """
+        Loads prefixes of all guilds into cache with one query.
+        :return: int number of cached guild prefixes
+        """
+        query = "SELECT GUILD_ID, PREFIX FROM GUILDS"
+        async with self.connection.execute(query) as cursor:
+            results = await cursor.fetchall()
+        self._prefix_cache.update((int(guild_id), prefix) for guild_id, prefix in results)
+        return len(self._prefix_cache)
 
     async def get_all_guild_ids(self):
         """
@@ -126,6 +230,7 @@ class DatabaseHandler:
         """
         query = "UPDATE GUILDS SET PREFIX=? WHERE GUILD_ID=?"
         await self.update_database(query, prefix, guild_id)
+        self._prefix_cache[guild_id] = prefix
 
     async def change_default_guild_role(self, guild_id: int, role_id: int):
         query = "UPDATE GUILDS SET DEFAULT_LICENSE_ROLE_ID=? WHERE GUILD_ID=?"
@@ -208,6 +313,29 @@ class DatabaseHandler:
             else:
                 raise DatabaseMissingData(f"ID {member_id} doesn't exists in database table LICENSED_MEMBERS.")
 
+    async def get_all_licensed_members(self) -> List[Tuple]:
+        """
+        Used by expiry check.
+        :return: [(member id, guild id, str expiration date, licensed role id), ...]
+        """
+        query = "SELECT MEMBER_ID, GUILD_ID, EXPIRATION_DATE, LICENSED_ROLE_ID FROM LICENSED_MEMBERS"
+        async with self.connection.execute(query) as cursor:
+            return await cursor.fetchall()
+
+    async def iter_licensed_member_chunks(self, chunk_size: int = 10_000) -> AsyncIterator[List[Tuple]]:
+        """
+        Used by expiry check, same rows as get_all_licensed_members but fetched chunk_size at a time
+        so the whole table is never in memory.
+        :return: async iterator of lists of (member id, guild id, str expiration date, licensed role id)
+        """
+        query = "SELECT MEMBER_ID, GUILD_ID, EXPIRATION_DATE, LICENSED_ROLE_ID FROM LICENSED_MEMBERS"
+        async with self.connection.execute(query) as cursor:
+            while True:
+                rows = await cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
     async def get_member_data(self, guild_id: int, member_id: int) -> List[Tuple]:
         """
         Return type:
@@ -222,6 +350,25 @@ class DatabaseHandler:
             else:
                 raise DatabaseMissingData(f"No active licenses for member {member_id} in guild {guild_id}.")
 
+    async def get_member_data_page(self, guild_id: int, member_id: int,
+                                   after_role_id: str = "", limit: int = 10) -> List[Tuple]:
+        """
+        Keyset paginated version of get_member_data, rows are ordered by LICENSED_ROLE_ID.
+        :param after_role_id: str LICENSED_ROLE_ID of the last row from the previous page, "" for the first page
+        :param limit: max number of rows to return
+        :return: [(str licensed role id, str expiration date), ...]
+        """
+        query = """SELECT LICENSED_ROLE_ID, EXPIRATION_DATE FROM LICENSED_MEMBERS
+                   WHERE GUILD_ID=? AND MEMBER_ID=? AND LICENSED_ROLE_ID>? ORDER BY LICENSED_ROLE_ID LIMIT ?"""
+        async with self.connection.execute(query, (guild_id, member_id, after_role_id, limit)) as cursor:
+            return await cursor.fetchall()
+
+    async def get_member_license_count(self, guild_id: int, member_id: int) -> int:
+        query = "SELECT COUNT(*) FROM LICENSED_MEMBERS WHERE GUILD_ID=? AND MEMBER_ID=?"
+        async with self.connection.execute(query, (guild_id, member_id)) as cursor:
+            result = await cursor.fetchone()
+            return result[0]
+
     async def get_guild_licensed_roles_total_count(self, guild_id: int) -> int:
         query = "SELECT COUNT(*) FROM LICENSED_MEMBERS WHERE GUILD_ID=?"
         async with self.connection.execute(query, (guild_id,)) as cursor:
@@ -243,6 +390,8 @@ class DatabaseHandler:
         :return: tuple(int guild id, int license role id)
 
         """
+        if await self._license_filter_rejects(license):
+            return None
         query = "SELECT GUILD_ID, LICENSED_ROLE_ID FROM GUILD_LICENSES WHERE LICENSE=?"
         async with self.connection.execute(query, (license,)) as cursor:
             row = await cursor.fetchone()
@@ -280,6 +429,7 @@ class DatabaseHandler:
         for license in licenses:
             await self.connection.execute(query, (license, guild_id, license_role_id, license_duration))
         await self.connection.commit()
+        await self._add_to_license_filter(licenses)
         return licenses
 
     async def delete_license(self, license: str):
@@ -293,7 +443,9 @@ class DatabaseHandler:
 
         """
         delete_query = "DELETE FROM GUILD_LICENSES WHERE LICENSE=?"
-        await self.update_database(delete_query, license)
+        cursor = await self.connection.execute(delete_query, (license,))
+        await self.connection.commit()
+        await self._licenses_deleted(cursor.rowcount)
 
     async def get_guild_licenses(self, number: int, guild_id: int, license_role_id: int) -> list:
         """
@@ -311,6 +463,25 @@ class DatabaseHandler:
         async with self.connection.execute(query, (guild_id, license_role_id, number)) as cursor:
             return await cursor.fetchall()
 
+    async def get_guild_licenses_page(self, guild_id: int, license_role_id: int,
+                                      after_license: str = "", limit: int = 15) -> list:
+        """
+        Keyset paginated version of get_guild_licenses, rows are ordered by LICENSE.
+        :param after_license: str last license from the previous page, "" for the first page
+        :param limit: max number of rows to return
+        :return: List of tuples in format [('license', license_duration_int_hours)]
+        """
+        query = """SELECT LICENSE, LICENSE_DURATION_HOURS FROM GUILD_LICENSES
+                   WHERE GUILD_ID=? AND LICENSED_ROLE_ID=? AND LICENSE>? ORDER BY LICENSE LIMIT ?"""
+        async with self.connection.execute(query, (guild_id, license_role_id, after_license, limit)) as cursor:
+            return await cursor.fetchall()
+
+    async def get_guild_role_license_count(self, guild_id: int, license_role_id: int) -> int:
+        query = "SELECT COUNT(*) FROM GUILD_LICENSES WHERE GUILD_ID=? AND LICENSED_ROLE_ID=?"
+        async with self.connection.execute(query, (guild_id, license_role_id)) as cursor:
+            result = await cursor.fetchone()
+            return result[0]
+
     async def get_guild_license_total_count(self, guild_id: int) -> int:
         query = "SELECT COUNT(*) FROM GUILD_LICENSES WHERE GUILD_ID=?"
         async with self.connection.execute(query, (guild_id,)) as cursor:
@@ -332,6 +503,8 @@ class DatabaseHandler:
         :return: True if license is valid, False otherwise
 
         """
+        if await self._license_filter_rejects(license):
+            return False
         query = "SELECT LICENSE FROM GUILD_LICENSES WHERE LICENSE=? AND GUILD_ID=?"
         async with self.connection.execute(query, (license, guild_id)) as cursor:
             row = await cursor.fetchone()
@@ -347,7 +520,73 @@ class DatabaseHandler:
 
     async def remove_all_stored_guild_licenses(self, guild_id: int):
         query = "DELETE FROM GUILD_LICENSES WHERE GUILD_ID=?"
-        await self.update_database(query, guild_id)
+        cursor = await self.connection.execute(query, (guild_id,))
+        await self.connection.commit()
+        await self._licenses_deleted(cursor.rowcount)
+
+    async def rebuild_license_filter(self):
+        """
+        Builds license filter from all stored licenses.
+        Licenses generated while this runs are added to the new filter too so it never misses a license.
+        """
+        if self._licenses_added_during_rebuild is not None:
+            # Already rebuilding
+            return
+        self._licenses_added_during_rebuild = added_during_rebuild = []
+        try:
+            # Taken before reading so changes committed by others during the read are caught by the next check
+            data_version = await self._get_data_version()
+            capacity = max(await self.get_stored_license_total_count() * 2, _LICENSE_FILTER_MIN_CAPACITY)
+            license_filter = BloomFilter(capacity)
+            async with self.connection.execute("SELECT LICENSE FROM GUILD_LICENSES") as cursor:
+                async for row in cursor:
+                    license_filter.add(row[0])
+            license_filter.update(added_during_rebuild)
+        finally:
+            self._licenses_added_during_rebuild = None
+        self.license_filter = license_filter
+        self._license_filter_data_version = data_version
+        self._license_filter_stale_count = 0
+        logger.info(f"License filter built with {len(license_filter)} licenses, "
+                    f"{license_filter.memory_bytes / 1024:.1f}KiB, "
+                    f"false positive rate {license_filter.false_positive_rate:.5%}.")
+
+    async def _license_filter_rejects(self, license: str) -> bool:
+        """
+        Filter never misses licenses added by the bot, but licenses committed by other connections are not in it.
+        On a miss the database data_version is checked (it changes only when other connections commit),
+        if it changed the filter is rebuilt before the answer so it never rejects an existing license.
+        :return: bool True if license surely doesn't exist, False if it has to be looked up
+        """
+        if self.license_filter is None or license in self.license_filter:
+            return False
+        if await self._get_data_version() != self._license_filter_data_version:
+            logger.info("Database changed by another connection, rebuilding license filter.")
+            await self.rebuild_license_filter()
+            if self._licenses_added_during_rebuild is not None:
+                # Rebuild started elsewhere is still running, filter can't be trusted until it's done
+                return False
+        return license not in self.license_filter
+
+    async def _get_data_version(self) -> int:
+        async with self.connection.execute("PRAGMA data_version") as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def _add_to_license_filter(self, licenses: List[str]):
+        if self._licenses_added_during_rebuild is not None:
+            self._licenses_added_during_rebuild.extend(licenses)
+        if self.license_filter is not None:
+            self.license_filter.update(licenses)
+            if len(self.license_filter) > self.license_filter.capacity:
+                await self.rebuild_license_filter()
+
+    async def _licenses_deleted(self, count: int):
+        """Deleted licenses stay in the filter as false positives, once there are too many of them rebuild it."""
+        if self.license_filter is None or count <= 0:
+            return
+        self._license_filter_stale_count += count
+        if self._license_filter_stale_count > max(len(self.license_filter) // 2, _LICENSE_FILTER_MIN_CAPACITY // 10):
+            await self.rebuild_license_filter()
 
     # ALL TABLES #########################################################################
 
@@ -356,15 +595,24 @@ class DatabaseHandler:
                    "DELETE FROM GUILD_LICENSES WHERE GUILD_ID=?"]
         if guild_table_too:
             queries.append("DELETE FROM GUILDS WHERE GUILD_ID=?")
+            self._prefix_cache.pop(guild_id, None)
+        deleted_licenses = 0
         for query in queries:
-            await self.connection.execute(query, (guild_id,))
+            cursor = await self.connection.execute(query, (guild_id,))
+            if "GUILD_LICENSES" in query:
+                deleted_licenses = cursor.rowcount
 
         await self.connection.commit()
+        await self._licenses_deleted(deleted_licenses)
 
     async def remove_all_guild_role_data(self, role_id: int):
         queries = ["DELETE FROM LICENSED_MEMBERS WHERE LICENSED_ROLE_ID=?",
                    "DELETE FROM GUILD_LICENSES WHERE LICENSED_ROLE_ID=?"]
+        deleted_licenses = 0
         for query in queries:
-            await self.connection.execute(query, (role_id,))
+            cursor = await self.connection.execute(query, (role_id,))
+            if "GUILD_LICENSES" in query:
+                deleted_licenses = cursor.rowcount
 
         await self.connection.commit()
+        await self._licenses_deleted(deleted_licenses)
@@ -1,8 +1,33 @@
+import re
+import gzip
 import json
+import time
+import asyncio
+import argparse
 import sqlite3
-from typing import Dict, Any
+from pathlib import Path
+from contextlib import closing
+from functools import partial
+from operator import itemgetter
+from itertools import groupby, islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from abc import ABC, abstractmethod
-from datetime import datetime, timezone
+from datetime import datetime, timezone, tzinfo
+from typing import Dict, Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from databases import schema
+from database_handler import DatabaseHandler
+
+
+class TableData(NamedTuple):
+    """
+    Column names and rows of one table, rows are usually a cursor so they're read lazily while being saved.
+    single_row tables (GUILDS) are saved as one {column: value} dict instead of {index: {column: value}}.
+    """
+    columns: Tuple[str, ...]
+    rows: Iterable[tuple]
+    single_row: bool = False
+
 
 class BackupAdapter(ABC):
     @abstractmethod
@@ -14,8 +39,33 @@ class BackupAdapter(ABC):
         ...
     @abstractmethod
     def save(self, data: Any, *, file_name: str) -> None:
+        """:param file_name: str path without extension, file_extension is appended"""
         ...
 
+    def save_tables(self, tables: Dict[str, TableData], *, file_name: str) -> None:
+        """
+        Saves tables as they're read. Default implementation loads everything into a dict and calls format/save,
+        adapters override it to stream rows instead.
+        :param file_name: str path including file_extension, unlike save
+        """
+        extension = f".{self.file_extension}"
+        if file_name.endswith(extension):
+            file_name = file_name[:-len(extension)]
+        self.save(self.format(tables_to_dict(tables)), file_name=file_name)
+
+
+def tables_to_dict(tables: Dict[str, TableData]) -> dict:
+    """:return: dict in the format that format/save of adapters expect"""
+    data = {}
+    for table_name, table in tables.items():
+        rows = (dict(zip(table.columns, row)) for row in table.rows)
+        if table.single_row:
+            data[table_name] = next(rows, {})
+        else:
+            data[table_name] = dict(enumerate(rows))
+    return data
+
+
 class JSONBackup(BackupAdapter):
     def format(self, data: dict) -> Any:
         return json.dumps(data, indent=2)
@@ -25,9 +75,125 @@ class JSONBackup(BackupAdapter):
         return "json"
 
     def save(self, data: str, *, file_name: str) -> None:
-        with open(file_name + self.file_extension, "w") as f:
+        with open(f"{file_name}.{self.file_extension}", "w") as f:
+            f.write(data)
+
+    def save_tables(self, tables: Dict[str, TableData], *, file_name: str) -> None:
+        """Same structure as format output but written row by row, so memory use doesn't depend on row count."""
+        with open(file_name, "w") as f:
+            f.write("{")
+            for table_index, (table_name, table) in enumerate(tables.items()):
+                f.write(f"{',' if table_index else ''}\n  {json.dumps(table_name)}: ")
+                rows = (dict(zip(table.columns, row)) for row in table.rows)
+                if table.single_row:
+                    f.write(json.dumps(next(rows, {})))
+                    continue
+                f.write("{")
+                for row_index, row in enumerate(rows):
+                    f.write(f"{',' if row_index else ''}\n    \"{row_index}\": {json.dumps(row)}")
+                f.write("\n  }")
+            f.write("\n}\n")
+
+
+class NDJSONBackup(BackupAdapter):
+    """
+    Gzip compressed newline delimited json, written and read row by row so memory use is bounded.
+    Every table starts with a {"table": str, "columns": list, "single_row": bool} line
+    followed by one json array line per row, values in column order.
+    """
+    _encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def __init__(self, compression_level: int = 6):
+        """:param compression_level: int gzip level 1-9, 6 is nearly as small as 9 but a lot faster"""
+        self.compression_level = compression_level
+
+    def format(self, data: dict) -> str:
+        return "".join(self._format_lines(_dict_to_tables(data)))
+
+    @property
+    def file_extension(self) -> str:
+        return "ndjson.gz"
+
+    def save(self, data: str, *, file_name: str) -> None:
+        with self._open(f"{file_name}.{self.file_extension}", "wt") as f:
             f.write(data)
 
+    def save_tables(self, tables: Dict[str, TableData], *, file_name: str) -> None:
+        with self._open(file_name, "wt") as f:
+            f.writelines(self._format_lines(tables))
+
+    def _open(self, file_name: str, mode: str):
+        if "w" in mode:
+            return gzip.open(file_name, mode, compresslevel=self.compression_level, encoding="utf-8", newline="\n")
+        return gzip.open(file_name, mode, encoding="utf-8", newline="\n")
+
+    @classmethod
+    def _format_lines(cls, tables: Dict[str, TableData]) -> Iterator[str]:
+        encode = cls._encoder.encode
+        for table_name, table in tables.items():
+            header = {"table": table_name, "columns": table.columns, "single_row": table.single_row}
+            yield encode(header) + "\n"
+            for row in table.rows:
+                yield encode(row) + "\n"
+
+    def read_tables(self, file_name: str) -> Iterator[Tuple[str, TableData]]:
+        """
+        Streams a saved backup back, table by table.
+        Rows of each table are a lazy iterator that has to be used before moving on to the next table,
+        rows that are not used are skipped.
+        :param file_name: str path of the backup including extension
+        :return: iterator of (table name, TableData) in the order they were saved
+        """
+        with self._open(file_name, "rt") as f:
+            values = map(json.loads, f)
+            next_header = next(values, None)
+            while next_header is not None:
+                header, next_header = next_header, None
+
+                def read_rows() -> Iterator[tuple]:
+                    nonlocal next_header
+                    for value in values:
+                        if isinstance(value, dict):
+                            next_header = value
+                            return
+                        yield tuple(value)
+
+                rows = read_rows()
+                yield header["table"], TableData(tuple(header["columns"]), rows, header["single_row"])
+                for _ in rows:
+                    pass
+
+
+def _dict_to_tables(data: dict) -> Dict[str, TableData]:
+    """Inverse of tables_to_dict, for adapters that format TableData."""
+    tables = {}
+    for table_name, table in data.items():
+        single_row = bool(table) and not any(isinstance(value, dict) for value in table.values())
+        rows = [table] if single_row else list(table.values())
+        columns = tuple(rows[0]) if rows else ()
+        tables[table_name] = TableData(columns, [tuple(row.values()) for row in rows], single_row)
+    return tables
+
+
+def _connect_existing(database: str, **kwargs) -> sqlite3.Connection:
+    """
+    Opens database that has to exist, sqlite3.connect would silently create an empty one
+    (example wrong working directory) and everything read from it would be empty.
+    :param kwargs: passed to sqlite3.connect
+    :raise: sqlite3.OperationalError if database doesn't exist
+    """
+    return sqlite3.connect(f"{Path(database).resolve().as_uri()}?mode=rw", uri=True, **kwargs)
+
+
+def _chunks(rows: Iterable[tuple], chunk_size: int) -> Iterator[List[tuple]]:
+    """:return: iterator of lists with up to chunk_size rows each"""
+    rows = iter(rows)
+    chunk = list(islice(rows, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(rows, chunk_size))
+
+
 class SqliteBackup(BackupAdapter):
     def format(self, data: dict) -> dict:
         return data
@@ -37,101 +203,150 @@ class SqliteBackup(BackupAdapter):
         return "sqlite3"
 
     def save(self, data: dict, *, file_name: str) -> None:
+        self.save_tables(_dict_to_tables(data), file_name=f"{file_name}.{self.file_extension}")
+
+    def save_tables(self, tables: Dict[str, TableData], *, file_name: str) -> None:
+        """Indexes are created after the rows are loaded, building them once is faster than updating per row."""
         self._create_db_tables(file_name=file_name)
-        self._save_db_data(file_name, data)
+        load_tables(tables.items(), file_name, bulk_load=True)
+        with closing(sqlite3.connect(file_name)) as con:
+            con.executescript(schema.create_script(tables=False))
 
     @classmethod
     def _create_db_tables(cls, *, file_name: str):
-        con = sqlite3.connect(file_name)
-        cur = con.cursor()
-        cur.execute("CREATE TABLE GUILDS"
-                    "("
-                    "GUILD_ID TEXT PRIMARY KEY, "
-                    "PREFIX TEXT CHECK(PREFIX IS NULL OR LENGTH(PREFIX) <= 5), "
-                    "ENABLE_LOG_CHANNEL TINYINT DEFAULT 0, "
-                    "LOG_CHANNEL_ID TEXT, "
-                    "DEFAULT_LICENSE_ROLE_ID TEXT, "
-                    "DEFAULT_LICENSE_DURATION_HOURS UNSIGNED BIG INT DEFAULT 720"
-                    ")"
-                    )
-        cur.execute("CREATE TABLE LICENSED_MEMBERS"
-                    "("
-                    "MEMBER_ID TEXT,"
-                    "GUILD_ID TEXT,"
-                    "EXPIRATION_DATE DATE,"
-                    "LICENSED_ROLE_ID TEXT,"
-                    "UNIQUE(MEMBER_ID, LICENSED_ROLE_ID)"
-                    ")"
-                    )
-        cur.execute("CREATE TABLE GUILD_LICENSES"
-                    "("
-                    "LICENSE TEXT PRIMARY KEY,"
-                    "GUILD_ID TEXT,"
-                    "LICENSED_ROLE_ID TEXT,"
-                    "LICENSE_DURATION_HOURS UNSIGNED BIG INT"
-                    ")"
-                    )
-        con.commit()
-        con.close()
+        with closing(sqlite3.connect(file_name)) as con:
+            con.executescript(schema.create_script(indexes=False))
 
-    @classmethod
-    def _save_db_data(cls, file_name: str, data: dict):
-        con = sqlite3.connect(file_name)
-        cur = con.cursor()
-        cur.execute(
-            "INSERT INTO GUILDS("
-            "GUILD_ID,"
-            "PREFIX,"
-            "ENABLE_LOG_CHANNEL,"
-            "LOG_CHANNEL_ID,"
-            "DEFAULT_LICENSE_ROLE_ID,"
-            "DEFAULT_LICENSE_DURATION_HOURS"
-            ") VALUES(?,?,?,?,?,?)",
-            (*data["GUILDS"].values(),),
+    def read_tables(self, file_name: str) -> Iterator[Tuple[str, TableData]]:
+        """Streams tables of a saved backup, same as NDJSONBackup.read_tables."""
+        with closing(_connect_existing(file_name)) as con:
+            for table_name in schema.TABLES:
+                cursor = con.execute(f"SELECT * FROM {table_name}")
+                yield table_name, TableData(next(zip(*cursor.description)), cursor, table_name == "GUILDS")
+
+
+def _save_guild_tables(backup_format: BackupAdapter, tables: Dict[str, TableData], file_name: str,
+                       server_timezone: Optional[tzinfo], date_format: str):
+    if server_timezone is not None:
+        tables["LICENSED_MEMBERS"] = Backup._naive_dates_to_tz(
+            tables["LICENSED_MEMBERS"], server_timezone, date_format
         )
-        for licensed_member_sub_dict in data["LICENSED_MEMBERS"].values():
-            licensed_member_data = [*licensed_member_sub_dict.values()]
-            cur.execute(
-                "INSERT INTO LICENSED_MEMBERS("
-                "MEMBER_ID,"
-                "GUILD_ID,"
-                "EXPIRATION_DATE,"
-                "LICENSED_ROLE_ID"
-                ") VALUES(?,?,?,?)",
-                (*licensed_member_data,),
-            )
-        for guild_license_sub_dict in data["GUILD_LICENSES"].values():
-            guild_license_data = [*guild_license_sub_dict.values()]
-            cur.execute(
-                "INSERT INTO GUILD_LICENSES("
-                "LICENSE,"
-                "GUILD_ID,"
-                "LICENSED_ROLE_ID,"
-                "LICENSE_DURATION_HOURS"
-                ") VALUES(?,?,?,?)",
-                (*guild_license_data,),
-            )
-        con.commit()
-        con.close()
+    backup_format.save_tables(tables, file_name=f"{file_name}.{backup_format.file_extension}")
+
+
+def _save_guild_batch(backup_format: BackupAdapter, batch: List[Tuple[str, Dict[str, TableData]]],
+                      server_timezone: Optional[tzinfo], date_format: str):
+    """Module level so it can run in worker processes."""
+    for file_name, tables in batch:
+        _save_guild_tables(backup_format, tables, file_name, server_timezone, date_format)
+
 
 class Backup:
-    DATABASE = "main.sqlite3"
+    # Database of the bot, relative to the repository root
+    DATABASE = DatabaseHandler._construct_path("main")
 
-    def __init__(self, backup_format: BackupAdapter):
-        self._conn = sqlite3.connect(self.DATABASE)
+    def __init__(self, backup_format: BackupAdapter, database: str = DATABASE):
+        self._conn = _connect_existing(database)
         self._backup_format = backup_format
 
-    def backup(self, guild_id: int, *, file_name: str = "backup", server_timezone: timezone = None):
-        licensed_members = self.get_licensed_members_table(guild_id)
+    def backup(self, guild_id: int, *, file_name: str = "backup", server_timezone: tzinfo = None,
+               date_format: str = "iso"):
+        """
+        Rows are streamed from the database straight to the backup file.
+        :param server_timezone: tzinfo timezone of the stored expiration dates, if passed they're saved timezone aware
+        :param date_format: str "iso" or "epoch", format of timezone aware expiration dates, see convert_dates
+        """
+        licensed_members = self._select_guild_rows("LICENSED_MEMBERS", guild_id)
         if server_timezone is not None:
-            self._naive_dates_to_tz(licensed_members, server_timezone)
-        data = {
-            "GUILDS": self.get_guild_table(guild_id),
+            licensed_members = self._naive_dates_to_tz(licensed_members, server_timezone, date_format)
+        tables = {
+            "GUILDS": self._select_guild_rows("GUILDS", guild_id, single_row=True),
             "LICENSED_MEMBERS": licensed_members,
-            "GUILD_LICENSES": self.get_guild_licenses_table(guild_id)
+            "GUILD_LICENSES": self._select_guild_rows("GUILD_LICENSES", guild_id)
         }
-        formatted_data = self._backup_format.format(data)
-        self._backup_format.save(formatted_data, file_name=f"{file_name}_{guild_id}.{self._backup_format.file_extension}")
+        self._backup_format.save_tables(
+            tables, file_name=f"{file_name}_{guild_id}.{self._backup_format.file_extension}"
+        )
+
+    def backup_all(self, *, file_name: str = "backup", server_timezone: tzinfo = None, date_format: str = "iso",
+                   processes: int = 0) -> int:
+        """
+        Backs up every guild into its own file, same files as calling backup for each guild
+        but every table is read only once instead of once per guild.
+        :param processes: int number of worker processes that format and save the files, 0 saves in this process
+        :return: int number of backed up guilds
+        """
+        count = 0
+        guilds = self._iter_guild_tables()
+        if not processes:
+            for guild_id, tables in guilds:
+                _save_guild_tables(
+                    self._backup_format, tables, f"{file_name}_{guild_id}", server_timezone, date_format
+                )
+                count += 1
+            return count
+
+        pending = set()
+        with ProcessPoolExecutor(processes) as executor:
+            for batch in self._batch_guilds(guilds, file_name):
+                # Bounded so guilds are not read into memory faster than workers save them
+                if len(pending) >= processes * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(
+                    _save_guild_batch, self._backup_format, batch, server_timezone, date_format
+                ))
+                count += len(batch)
+            for future in pending:
+                future.result()
+        return count
+
+    @staticmethod
+    def _batch_guilds(guilds: Iterable[Tuple[str, Dict[str, TableData]]], file_name: str,
+                      rows_per_batch: int = 10_000) -> Iterator[List[Tuple[str, Dict[str, TableData]]]]:
+        """Groups small guilds together so sending them to worker processes doesn't cost more than saving them."""
+        batch = []
+        batch_rows = 0
+        for guild_id, tables in guilds:
+            batch.append((f"{file_name}_{guild_id}", tables))
+            batch_rows += sum(len(table.rows) for table in tables.values())
+            if batch_rows >= rows_per_batch:
+                yield batch
+                batch = []
+                batch_rows = 0
+        if batch:
+            yield batch
+
+    def _iter_guild_tables(self) -> Iterator[Tuple[str, Dict[str, TableData]]]:
+        """
+        Reads every table once ordered by GUILD_ID and merges them by guild.
+        Only one guild's rows are in memory at a time.
+        :return: iterator of (guild id, tables of that guild), guilds in GUILD_ID order
+        """
+        columns = {}
+        groups = {}
+        for table_name in schema.TABLES:
+            cursor = self._conn.execute(
+                f"SELECT * FROM {table_name} WHERE GUILD_ID IS NOT NULL ORDER BY GUILD_ID"
+            )
+            columns[table_name] = next(zip(*cursor.description))
+            groups[table_name] = groupby(cursor, key=itemgetter(columns[table_name].index("GUILD_ID")))
+        heads = {table_name: next(table_groups, None) for table_name, table_groups in groups.items()}
+        while any(heads.values()):
+            guild_id = min(head[0] for head in heads.values() if head is not None)
+            tables = {}
+            for table_name, head in heads.items():
+                rows = []
+                if head is not None and head[0] == guild_id:
+                    rows = list(head[1])
+                    heads[table_name] = next(groups[table_name], None)
+                tables[table_name] = TableData(columns[table_name], rows, table_name == "GUILDS")
+            yield guild_id, tables
+
+    def _select_guild_rows(self, table_name: str, guild_id: int, single_row: bool = False) -> TableData:
+        cursor = self._conn.execute(f"SELECT * FROM {table_name} WHERE GUILD_ID=?", (guild_id,))
+        return TableData(next(zip(*cursor.description)), cursor, single_row)
 
     def get_guild_table(self, guild_id) -> Dict[str, Any]:
         cursor = self._conn.cursor()
@@ -159,8 +374,490 @@ class Backup:
         return return_data
 
     @classmethod
-    def _naive_dates_to_tz(cls, licensed_members_data: dict, server_timezone: timezone):
-        for sub_dict in licensed_members_data.values():
-            naive_datetime = datetime.strptime(sub_dict["EXPIRATION_DATE"], "%Y-%m-%d %H:%M:%S.%f")
-            proper_datetime = naive_datetime.replace(tzinfo=server_timezone)
-            sub_dict["EXPIRATION_DATE"] = str(proper_datetime)
\ No newline at end of file
+    def _naive_dates_to_tz(cls, licensed_members: TableData, server_timezone: tzinfo, date_format: str = "iso",
+                           chunk_size: int = 10_000) -> TableData:
+        """
+        Rows are converted in chunks, whole EXPIRATION_DATE column of a chunk at once with convert_dates.
+        :param date_format: str see convert_dates
+        """
+        date_index = licensed_members.columns.index("EXPIRATION_DATE")
+
+        def convert(rows: Iterable[tuple]) -> Iterator[tuple]:
+            for chunk in _chunks(rows, chunk_size):
+                columns = list(zip(*chunk))
+                columns[date_index] = convert_dates(columns[date_index], server_timezone, date_format)
+                yield from zip(*columns)
+
+        return licensed_members._replace(rows=convert(licensed_members.rows))
+
+
+# Y-M-D H:M:S[.mS] how the bot stores expiration dates, str(datetime) without and with microseconds
+_NAIVE_DATE = re.compile(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d{6})?\Z")
+DATE_FORMATS = ("iso", "epoch")
+
+
+def convert_dates(dates: Iterable[Optional[str]], server_timezone: tzinfo, date_format: str = "iso") -> list:
+    """
+    Converts a whole column of stored expiration dates to timezone aware values.
+    Naive dates are local time of server_timezone, dates that already have UTC offset are converted to it.
+    Any format datetime.fromisoformat accepts is handled, with fixed offset timezones the format the bot stores
+    dates in takes a fast path that doesn't parse dates (only their shape is checked).
+    :param dates: str dates, None values stay None
+    :param server_timezone: tzinfo timezone the naive dates are in
+    :param date_format: str "iso" for 'Y-M-D H:M:S[.mS]+HH:MM' (same as str of aware datetime)
+                        or "epoch" for int timestamp
+    :return: list of converted dates in the same order
+    :raise: ValueError if date_format is unknown or a date is not in valid format
+    """
+    if date_format not in DATE_FORMATS:
+        raise ValueError(f"Date format has to be one of {', '.join(DATE_FORMATS)}.")
+    fixed_offset = isinstance(server_timezone, timezone)
+    to_datetime = datetime.fromisoformat
+
+    def to_aware_datetime(date: str) -> datetime:
+        parsed = to_datetime(date)
+        if parsed.tzinfo is None:
+            return parsed.replace(tzinfo=server_timezone)
+        return parsed.astimezone(server_timezone)
+
+    if date_format == "iso":
+        def convert_other(date: str) -> str:
+            return str(to_aware_datetime(date))
+
+        offset_suffix = datetime(2000, 1, 1, tzinfo=server_timezone).isoformat()[19:] if fixed_offset else None
+
+        def convert_naive(date: str) -> str:
+            return date + offset_suffix
+    else:
+        def convert_other(date: str) -> int:
+            return int(to_aware_datetime(date).timestamp())
+
+        day_timestamps = {}
+
+        def convert_naive(date: str) -> int:
+            # Lots of licenses expire on the same day so only the day part is parsed, once per day
+            day = date[:10]
+            day_timestamp = day_timestamps.get(day)
+            if day_timestamp is None:
+                day_timestamp = day_timestamps[day] = int(to_aware_datetime(day).timestamp())
+            return day_timestamp + int(date[11:13]) * 3600 + int(date[14:16]) * 60 + int(date[17:19])
+
+    if not fixed_offset:
+        # Offset depends on the date (DST) so every date has to be parsed
+        convert_naive = convert_other
+
+    is_naive = _NAIVE_DATE.match
+    return [
+        None if date is None else convert_naive(date) if is_naive(date) else convert_other(date)
+        for date in dates
+    ]
+
+
+def _to_stored_date(date: Any) -> Optional[str]:
+    """
+    Converts expiration date of any backup date format back to the format the bot stores.
+    Aware dates and timestamps are converted to local time of the bot (see licence_helper.get_current_time).
+    :param date: str naive or aware date, int/float timestamp or None
+    :return: str 'Y-M-D H:M:S[.mS]' naive local time, None stays None
+    :raise: ValueError if date is not in any of the backup formats
+    """
+    if date is None or (isinstance(date, str) and _NAIVE_DATE.match(date)):
+        return date
+    if isinstance(date, (int, float)) and not isinstance(date, bool):
+        return str(datetime.fromtimestamp(date))
+    try:
+        parsed = datetime.fromisoformat(date)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid expiration date in backup: {date!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return str(parsed)
+
+
+def _normalize_expiration_dates(tables: Iterable[Tuple[str, TableData]]) -> Iterator[Tuple[str, TableData]]:
+    """Lazily converts EXPIRATION_DATE of LICENSED_MEMBERS rows with _to_stored_date, other tables pass as they are."""
+    for table_name, table in tables:
+        if table_name == "LICENSED_MEMBERS" and "EXPIRATION_DATE" in table.columns:
+            date_index = table.columns.index("EXPIRATION_DATE")
+            rows = (
+                (*row[:date_index], _to_stored_date(row[date_index]), *row[date_index + 1:]) for row in table.rows
+            )
+            table = table._replace(rows=rows)
+        yield table_name, table
+
+
+# Used for restores into a new file, crash during the load can corrupt the file but the file is useless then anyway
+_BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode=OFF",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+# Used for merges into a database that's in use, only settings that can't corrupt it
+_MERGE_PRAGMAS = (
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA busy_timeout=5000",
+)
+_CONFLICT_CLAUSES = {"abort": "INSERT", "ignore": "INSERT OR IGNORE", "replace": "INSERT OR REPLACE"}
+
+
+def load_tables(tables: Iterable[Tuple[str, TableData]], database: str, *, on_conflict: str = "abort",
+                chunk_size: int = 20_000, bulk_load: bool = False) -> Dict[str, int]:
+    """
+    Inserts rows with executemany straight from the (possibly lazy) rows iterator so memory use doesn't
+    depend on table size.
+    Merges commit every chunk_size rows so writers of a live database are only blocked for one chunk at a time,
+    bulk loads are done in one transaction since every commit is an fsync.
+    :param tables: (table name, TableData) pairs, rows can be lazy (cursor, NDJSONBackup.read_tables)
+    :param database: str path of existing database to load into, tables have to exist
+    :param on_conflict: str what to do with rows whose key already exists:
+                        "abort" raises sqlite3.IntegrityError (chunks committed before it stay),
+                        "ignore" keeps existing rows, "replace" overwrites existing rows with the loaded ones
+    :param chunk_size: int rows per transaction when merging
+    :param bulk_load: bool one transaction and unsafe fast PRAGMAs, only for databases created by the load
+    :return: dict table name -> number of inserted (or replaced) rows
+    """
+    if on_conflict not in _CONFLICT_CLAUSES:
+        raise ValueError(f"on_conflict has to be one of {', '.join(_CONFLICT_CLAUSES)}.")
+    inserted = {}
+    with closing(_connect_existing(database)) as con:
+        for pragma in _BULK_LOAD_PRAGMAS if bulk_load else _MERGE_PRAGMAS:
+            con.execute(pragma)
+        for table_name, table in tables:
+            inserted[table_name] = 0
+            if not table.columns:
+                # Empty table from a dict backup, columns are unknown but there is nothing to insert anyway
+                continue
+            query = (f"{_CONFLICT_CLAUSES[on_conflict]} INTO {table_name}({','.join(table.columns)}) "
+                     f"VALUES({','.join('?' * len(table.columns))})")
+            if bulk_load:
+                with con:
+                    inserted[table_name] = con.executemany(query, table.rows).rowcount
+                continue
+            for chunk in _chunks(table.rows, chunk_size):
+                with con:
+                    inserted[table_name] += con.executemany(query, chunk).rowcount
+    return inserted
+
+
+def merge_backup(file_name: str, database: str = Backup.DATABASE, *, on_conflict: str = "abort",
+                 chunk_size: int = 20_000) -> Dict[str, int]:
+    """
+    Merges a guild backup (any of the adapter formats) into an existing database.
+    Expiration dates of backups made with server timezone (aware iso or epoch) are converted back to the
+    naive local format the bot stores, a date that can't be converted aborts the merge with ValueError
+    (chunks committed before it stay, same as on_conflict="abort").
+    If the bot is running on that database its license filter picks up merged licenses on its own,
+    prefix cache doesn't so restart it if GUILDS rows were replaced.
+    :param file_name: str path of backup file including extension
+    :param database: str path of existing database
+    :return: dict table name -> number of inserted (or replaced) rows
+    """
+    with closing(_connect_existing(database)) as con:
+        con.executescript(schema.create_script())
+    return load_tables(_normalize_expiration_dates(read_backup(file_name)), database, on_conflict=on_conflict,
+                       chunk_size=chunk_size)
+
+
+def read_backup(file_name: str) -> Iterator[Tuple[str, TableData]]:
+    """:return: iterator of (table name, TableData) of a backup file, format is decided by the extension"""
+    if file_name.endswith(NDJSONBackup().file_extension):
+        return NDJSONBackup().read_tables(file_name)
+    if file_name.endswith(SqliteBackup().file_extension):
+        return SqliteBackup().read_tables(file_name)
+    with open(file_name) as f:
+        return iter(_dict_to_tables(json.load(f)).items())
+
+
+def snapshot(source: str, destination: str, *, pages_per_step: int = -1,
+             progress: Optional[Callable[[int, int, int], None]] = None, pause: float = 0.0):
+    """
+    Consistent copy of the whole database using SQLite online backup API.
+    Pages are copied pages_per_step at a time and the source is only locked during a step,
+    so it can be used between the steps. A write by any other connection between the steps restarts the copy
+    from the first page, so databases that are written to often should be copied in one step
+    (with WAL journal that doesn't block writers) or through the writer's connection, see snapshot_connection.
+    Blocking, see snapshot_in_executor for use from the bot.
+    :param source: str path of existing database to back up
+    :param destination: str path of the snapshot file, overwritten if it exists
+    :param pages_per_step: int pages copied per step, -1 copies everything in one step
+    :param progress: optional callable(status, remaining pages, total pages) called after every step,
+                     exception raised from it aborts the snapshot
+    :param pause: float seconds to sleep after every step, throttles disk I/O of big snapshots
+    """
+    with closing(_connect_existing(source)) as source_connection:
+        snapshot_connection(source_connection, destination, pages_per_step=pages_per_step, progress=progress,
+                            pause=pause)
+
+
+def snapshot_connection(source_connection: sqlite3.Connection, destination: str, *, pages_per_step: int = -1,
+                        progress: Optional[Callable[[int, int, int], None]] = None, pause: float = 0.0):
+    """
+    Same as snapshot but copies through an already open connection.
+    Writes made through that same connection between the steps are applied to the copy instead of restarting it,
+    so a busy database can be copied in small throttled steps through the connection that writes to it.
+    While that connection is in the middle of a write transaction the step is retried.
+    :param source_connection: sqlite3.Connection, has to be created with check_same_thread=False
+                              if it's used by another thread too
+    """
+    if pause:
+        on_step = progress
+
+        def progress(status: int, remaining: int, total: int):
+            if on_step is not None:
+                on_step(status, remaining, total)
+            if remaining:
+                time.sleep(pause)
+
+    with closing(sqlite3.connect(destination)) as destination_connection:
+        source_connection.backup(destination_connection, pages=pages_per_step, progress=progress)
+
+
+async def snapshot_in_executor(source: str, destination: str, *, pages_per_step: int = -1,
+                               progress: Optional[Callable[[int, int, int], None]] = None, pause: float = 0.0):
+    """
+    Runs snapshot in default executor so the event loop keeps running.
+    Connections are opened inside the executor thread since sqlite3 connections can't change threads.
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        None, partial(snapshot, source, destination, pages_per_step=pages_per_step, progress=progress, pause=pause)
+    )
+
+
+# Table -> columns that identify a row, used for change tracking
+_ROW_KEYS = {
+    "GUILDS": ("GUILD_ID",),
+    "LICENSED_MEMBERS": ("MEMBER_ID", "LICENSED_ROLE_ID"),
+    "GUILD_LICENSES": ("LICENSE",),
+}
+
+
+def _change_tracking_script() -> str:
+    """
+    Triggers log the key of every inserted/updated/deleted row to CHANGELOG.
+    Only keys are logged, incremental backup reads the current row for each changed key.
+    Updates log both old and new key in case the key itself was changed.
+    """
+    statements = ["CREATE TABLE IF NOT EXISTS CHANGELOG("
+                  "VERSION INTEGER PRIMARY KEY AUTOINCREMENT, "
+                  "TABLE_NAME TEXT NOT NULL, "
+                  "ROW_KEY TEXT NOT NULL"
+                  ")"]
+    for table_name, key_columns in _ROW_KEYS.items():
+        for event, row_aliases in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+            inserts = " ".join(
+                f"INSERT INTO CHANGELOG(TABLE_NAME, ROW_KEY) "
+                f"VALUES('{table_name}', json_array({', '.join(f'{alias}.{column}' for column in key_columns)}));"
+                for alias in row_aliases
+            )
+            statements.append(f"CREATE TRIGGER IF NOT EXISTS {table_name}_{event}_CHANGELOG "
+                              f"AFTER {event} ON {table_name} BEGIN {inserts} END")
+    return ";\n".join(statements) + ";"
+
+
+_CHANGE_TRACKING_SCRIPT = _change_tracking_script()
+_DISABLE_CHANGE_TRACKING_SCRIPT = ";\n".join(
+    [f"DROP TRIGGER IF EXISTS {table_name}_{event}_CHANGELOG"
+     for table_name in _ROW_KEYS for event in ("INSERT", "UPDATE", "DELETE")] + ["DROP TABLE IF EXISTS CHANGELOG"]
+) + ";"
+PRUNE_CHANGELOG_QUERY = "DELETE FROM CHANGELOG WHERE VERSION <= ?"
+
+
+def _changelog_version(connection: sqlite3.Connection) -> int:
+    """
+    :return: int version of the last logged change, 0 if nothing was logged.
+             Read from sqlite_sequence so it doesn't go back when changelog is pruned.
+    """
+    row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name='CHANGELOG'").fetchone()
+    return 0 if row is None else row[0]
+
+
+def snapshot_changelog_version(file_name: str) -> Optional[int]:
+    """
+    :param file_name: str path of a snapshot (or any database)
+    :return: int changelog version of the snapshot, None if change tracking was not enabled in it
+    """
+    with closing(_connect_existing(file_name)) as connection:
+        tracked = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='CHANGELOG'"
+        ).fetchone()
+        return _changelog_version(connection) if tracked else None
+
+
+class IncrementalBackup:
+    """
+    Base snapshots plus small increments with only rows changed since the previous backup.
+
+    Change tracking triggers are stored in the database itself so once enabled (base does it) every
+    change made by the bot is logged, without the bot knowing about it.
+    Usage:
+        version = IncrementalBackup().base("base.sqlite3")
+        version = IncrementalBackup().increment(version, "increment_1.ndjson")
+        ...
+        restore("base.sqlite3", ["increment_1.ndjson", ...], "restored.sqlite3")
+
+    Increment file is json lines, first line is {"from_version": int, "to_version": int}
+    followed by one {"table": str, "key": list, "row": {column: value} or null if deleted} line per changed row.
+
+    Every base starts a new chain, changelog entries up to its version are pruned so CHANGELOG only grows
+    with changes since the latest base. Increments of older chains can't be made after that (those already
+    made still restore on top of their base).
+    Scheduled snapshots of the bot (DatabaseBackup cog) are bases too, they prune the changelog the same way
+    and increments can be made from their version (see snapshot_changelog_version).
+    Triggers add a write to every change, if increments are not used anymore remove them with
+    disable_change_tracking (disable-tracking in the command line tool).
+    """
+
+    def __init__(self, database: str = Backup.DATABASE):
+        self.database = database
+
+    def enable_change_tracking(self):
+        with closing(_connect_existing(self.database)) as connection:
+            connection.executescript(_CHANGE_TRACKING_SCRIPT)
+
+    def disable_change_tracking(self):
+        """Removes change tracking triggers and the changelog, increments can't be made until the next base."""
+        with closing(_connect_existing(self.database)) as connection:
+            connection.executescript(_DISABLE_CHANGE_TRACKING_SCRIPT)
+
+    def base(self, destination: str, *, pages_per_step: int = -1, prune: bool = True) -> int:
+        """
+        Full snapshot, changelog is part of it so the returned version is exactly the state of the snapshot.
+        :param prune: bool remove changelog entries covered by this snapshot, from both the database and
+                      the snapshot (version is kept in sqlite_sequence). Pass False to keep making increments
+                      of an older chain.
+        :return: int changelog version to pass to the first increment
+        """
+        self.enable_change_tracking()
+        snapshot(self.database, destination, pages_per_step=pages_per_step)
+        with closing(sqlite3.connect(destination)) as connection:
+            version = _changelog_version(connection)
+            if prune:
+                with connection:
+                    connection.execute("DELETE FROM CHANGELOG")
+        if prune:
+            self.prune(version)
+        return version
+
+    def increment(self, since_version: int, destination: str) -> int:
+        """
+        Saves current state of all rows changed after since_version.
+        Everything is read in one transaction so the increment is consistent.
+        :param since_version: int version returned by base or previous increment
+        :param destination: str path of the increment file
+        :return: int version to pass to the next increment
+        """
+        with closing(_connect_existing(self.database, isolation_level=None)) as connection:
+            connection.execute("BEGIN")
+            try:
+                to_version = _changelog_version(connection)
+                changes = connection.execute(
+                    "SELECT DISTINCT TABLE_NAME, ROW_KEY FROM CHANGELOG WHERE VERSION > ? AND VERSION <= ?",
+                    (since_version, to_version)
+                )
+                with open(destination, "w") as f:
+                    f.write(json.dumps({"from_version": since_version, "to_version": to_version}) + "\n")
+                    for table_name, row_key in changes:
+                        key = json.loads(row_key)
+                        where = " AND ".join(f"{column}=?" for column in _ROW_KEYS[table_name])
+                        cursor = connection.execute(f"SELECT * FROM {table_name} WHERE {where}", key)
+                        row = cursor.fetchone()
+                        if row is not None:
+                            row = dict(zip(next(zip(*cursor.description)), row))
+                        f.write(json.dumps({"table": table_name, "key": key, "row": row}) + "\n")
+            finally:
+                connection.execute("COMMIT")
+        return to_version
+
+    def prune(self, up_to_version: int):
+        """
+        Removes changelog entries that are already covered by a base snapshot, base does it for its version.
+        :param up_to_version: int version of the oldest base snapshot increments are still made for
+        """
+        with closing(_connect_existing(self.database)) as connection:
+            connection.execute(PRUNE_CHANGELOG_QUERY, (up_to_version,))
+            connection.commit()
+
+
+def _apply_change(connection: sqlite3.Connection, change: dict):
+    table_name, key, row = change["table"], change["key"], change["row"]
+    if row is None:
+        where = " AND ".join(f"{column}=?" for column in _ROW_KEYS[table_name])
+        connection.execute(f"DELETE FROM {table_name} WHERE {where}", key)
+    else:
+        connection.execute(f"INSERT OR REPLACE INTO {table_name}({','.join(row)}) "
+                           f"VALUES({','.join('?' * len(row))})", tuple(row.values()))
+
+
+def restore(base: str, increments: Sequence[str], destination: str) -> int:
+    """
+    Restores database from base snapshot and increments made after it, in order.
+    :param base: str path of base snapshot
+    :param increments: paths of increment files, ordered
+    :param destination: str path of restored database, overwritten if it exists
+    :return: int changelog version of the restored database
+    :raise: ValueError if increments don't continue one after another starting from base
+    """
+    snapshot(base, destination, pages_per_step=-1)
+    with closing(sqlite3.connect(destination)) as connection:
+        base_version = version = _changelog_version(connection)
+        for path in increments:
+            with open(path) as f:
+                header = json.loads(f.readline())
+                if header["from_version"] != version:
+                    raise ValueError(f"Increment {path} starts at version {header['from_version']}, "
+                                     f"expected {version}. Missing or out of order increment?")
+                with connection:
+                    for line in f:
+                        _apply_change(connection, json.loads(line))
+            version = header["to_version"]
+        # Replaying fired the change tracking triggers, those are not real changes so remove them
+        # and continue versions from the last increment.
+        with connection:
+            connection.execute("DELETE FROM CHANGELOG WHERE VERSION > ?", (base_version,))
+            connection.execute("UPDATE sqlite_sequence SET seq=? WHERE name='CHANGELOG'", (version,))
+    return version
+
+
+def main(arguments: List[str] = None):
+    parser = argparse.ArgumentParser(description="Licensy database backup tool.")
+    parser.add_argument("--database", default=Backup.DATABASE, help="database to back up")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    base_parser = subparsers.add_parser("base", help="full snapshot, enables change tracking")
+    base_parser.add_argument("destination")
+    increment_parser = subparsers.add_parser("increment", help="rows changed since version")
+    increment_parser.add_argument("since_version", type=int)
+    increment_parser.add_argument("destination")
+    restore_parser = subparsers.add_parser("restore", help="replay base snapshot and increments")
+    restore_parser.add_argument("base")
+    restore_parser.add_argument("increments", nargs="*")
+    restore_parser.add_argument("-o", "--output", required=True, help="restored database path")
+    merge_parser = subparsers.add_parser("merge", help="merge guild backup file into the database")
+    merge_parser.add_argument("backup_file")
+    merge_parser.add_argument("--on-conflict", choices=tuple(_CONFLICT_CLAUSES), default="abort")
+    subparsers.add_parser("disable-tracking", help="remove change tracking triggers and the changelog")
+    args = parser.parse_args(arguments)
+
+    if args.command == "merge":
+        for table_name, count in merge_backup(args.backup_file, args.database, on_conflict=args.on_conflict).items():
+            print(f"{table_name}: {count} rows")
+        return
+
+    incremental_backup = IncrementalBackup(args.database)
+    if args.command == "disable-tracking":
+        incremental_backup.disable_change_tracking()
+        print("Change tracking disabled.")
+        return
+    if args.command == "base":
+        version = incremental_backup.base(args.destination)
+    elif args.command == "increment":
+        version = incremental_backup.increment(args.since_version, args.destination)
+    else:
+        version = restore(args.base, args.increments, args.output)
+    print(f"Version: {version}")
+
+
+if __name__ == "__main__":
+    main()
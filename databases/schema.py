@@ -0,0 +1,45 @@
+"""
+Database schema, shared by the bot database and sqlite backups so they can't drift apart.
+Statements are idempotent so they can be run against existing databases.
+"""
+
+TABLES = {
+    "GUILDS": "CREATE TABLE IF NOT EXISTS GUILDS "
+              "("
+              "GUILD_ID TEXT PRIMARY KEY, "
+              "PREFIX TEXT CHECK(PREFIX IS NULL OR LENGTH(PREFIX) <= 5), "
+              "ENABLE_LOG_CHANNEL TINYINT DEFAULT 0, "
+              "LOG_CHANNEL_ID TEXT, "
+              "DEFAULT_LICENSE_ROLE_ID TEXT, "
+              "DEFAULT_LICENSE_DURATION_HOURS UNSIGNED BIG INT DEFAULT 720"
+              ")",
+    "LICENSED_MEMBERS": "CREATE TABLE IF NOT EXISTS LICENSED_MEMBERS "
+                        "("
+                        "MEMBER_ID TEXT, "
+                        "GUILD_ID TEXT, "
+                        "EXPIRATION_DATE DATE, "
+                        "LICENSED_ROLE_ID TEXT, "
+                        "UNIQUE(MEMBER_ID, LICENSED_ROLE_ID)"
+                        ")",
+    "GUILD_LICENSES": "CREATE TABLE IF NOT EXISTS GUILD_LICENSES "
+                      "("
+                      "LICENSE TEXT PRIMARY KEY, "
+                      "GUILD_ID TEXT, "
+                      "LICENSED_ROLE_ID TEXT, "
+                      "LICENSE_DURATION_HOURS UNSIGNED BIG INT"
+                      ")"
+}
+
+# Indexes used by keyset paginated queries (they're also used by queries filtering by guild)
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS GUILD_LICENSES_GUILD_ROLE_LICENSE "
+    "ON GUILD_LICENSES(GUILD_ID, LICENSED_ROLE_ID, LICENSE)",
+    "CREATE INDEX IF NOT EXISTS LICENSED_MEMBERS_GUILD_MEMBER_ROLE "
+    "ON LICENSED_MEMBERS(GUILD_ID, MEMBER_ID, LICENSED_ROLE_ID)",
+)
+
+
+def create_script(*, tables: bool = True, indexes: bool = True) -> str:
+    """:return: str script creating tables and/or indexes, for sqlite3 executescript"""
+    statements = (*(TABLES.values() if tables else ()), *(INDEXES if indexes else ()))
+    return ";\n".join(statements) + ";"
@@ -0,0 +1,67 @@
+import math
+import hashlib
+import secrets
+from typing import Iterable, Iterator
+
+
+class BloomFilter:
+    """
+    Probabilistic set, 'key in filter' is False only if the key was never added (no false negatives)
+    while True means the key was probably added (false positives happen at false_positive_rate).
+    Keys can't be removed, removed keys just stay as false positives until the filter is rebuilt.
+
+    Uses k indexes derived from one blake2b digest (double hashing).
+    Hash is keyed with a random per filter salt so keys that collide can't be precomputed.
+    """
+
+    def __init__(self, capacity: int, target_false_positive_rate: float = 0.001):
+        """
+        :param capacity: int number of keys after which false positive rate starts to exceed the target
+        :param target_false_positive_rate: float false positive rate when filter is filled up to capacity
+        """
+        if not 0 < target_false_positive_rate < 1:
+            raise ValueError("False positive rate has to be between 0 and 1.")
+        self.capacity = max(capacity, 1)
+        self.target_false_positive_rate = target_false_positive_rate
+        bit_count = math.ceil(-self.capacity * math.log(target_false_positive_rate) / math.log(2) ** 2)
+        self._bits = bytearray((bit_count + 7) // 8)
+        self._bit_count = len(self._bits) * 8
+        self._hash_count = max(round(self._bit_count / self.capacity * math.log(2)), 1)
+        self._salt = secrets.token_bytes(16)
+        self._count = 0
+
+    def __len__(self):
+        """:return: int number of added keys (including duplicates)"""
+        return self._count
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(key))
+
+    def _indexes(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16, key=self._salt).digest()
+        first = int.from_bytes(digest[:8], "little")
+        # Odd step so it never gets stuck on the same index
+        step = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self._hash_count):
+            yield (first + i * step) % self._bit_count
+
+    def add(self, key: str):
+        bits = self._bits
+        for index in self._indexes(key):
+            bits[index >> 3] |= 1 << (index & 7)
+        self._count += 1
+
+    def update(self, keys: Iterable[str]):
+        for key in keys:
+            self.add(key)
+
+    @property
+    def memory_bytes(self) -> int:
+        """:return: int size of the bit array"""
+        return len(self._bits)
+
+    @property
+    def false_positive_rate(self) -> float:
+        """:return: float estimated false positive rate for the current number of keys"""
+        return (1 - math.exp(-self._hash_count * self._count / self._bit_count)) ** self._hash_count
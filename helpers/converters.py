@@ -1,7 +1,9 @@
 import re
+import calendar
 import datetime
+import functools
+from typing import Tuple
 from discord.ext import commands
-from dateutil.relativedelta import relativedelta
 
 def positive_integer(integer):
     """
@@ -16,6 +18,53 @@ def positive_integer(integer):
     else:
         return integer
 
+_TIME_WORD = re.compile(r"""
+    (?:(?P<years>[0-9])(?:years?|y))?          # e.g. 2years or 2y
+    (?:(?P<months>[0-9]{1,2})(?:months?|m))?   # e.g. 2months or 2m
+    (?:(?P<weeks>[0-9]{1,4})(?:weeks?|w))?     # e.g. 10weeks or 10w
+    (?:(?P<days>[0-9]{1,5})(?:days?|d))?       # e.g. 14days or 10d
+    (?:(?P<hours>[0-9]{1,5})(?:hours?|h))?     # e.g. 12hours or 12h
+""", re.VERBOSE)
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_time_string(str_input: str) -> Tuple[Tuple[int, ...], int]:
+    """
+    Parses the date independent part of time string, results are cached since the same
+    durations are used over and over.
+    :param str_input: see time_string_to_hours
+    :return: tuple of:
+                tuple with number of months for each word that has years/months (years are 12 months),
+                their length in hours depends on the date they're counted from.
+                int fixed hours (weeks, days, hours) of all words combined.
+    :raise: commands.BadArgument if any of the words is invalid
+    """
+    word_months = []
+    fixed_hours = 0
+    for word in str_input.split():
+        match = _TIME_WORD.fullmatch(word)
+        if match is None or not match.group(0):
+            raise commands.BadArgument("Invalid time provided.")
+        years, months, weeks, days, hours = (int(value) if value else 0 for value in match.groups())
+        if years or months:
+            word_months.append(years * 12 + months)
+        fixed_hours += weeks * 168 + days * 24 + hours
+    return tuple(word_months), fixed_hours
+
+
+def _months_to_hours(months: int, start: datetime.date) -> int:
+    """
+    Calendar aware, same as relativedelta(months=months) added to start:
+    if the target month is shorter than start day then the last day of target month is used.
+    :return: int hours from start to the same day months later
+    """
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return (datetime.date(year, month, day).toordinal() - start.toordinal()) * 24
+
+
 def time_string_to_hours(str_input: str) -> int:
     """
     :param str_input: string where each word is in one of supported formats (years, months, weeks, days, hours).
@@ -25,28 +74,17 @@ def time_string_to_hours(str_input: str) -> int:
                     4w
     Each word has to contain integer + type format
     Formats are (separated by comma):years,y,months,m,weeks,w,days,d,hours,h
+    Years and months are counted from the current UTC date so their length in hours varies.
     :return: int representing hours that are converted from param str_input formats
     Example input/output:   5y 3months 7h   /   46063
                             3m 7weeks       /   3384
                             1w              /   168
     """
-    compiled = re.compile(r"""
-        (?:(?P<years>[0-9])(?:years?|y))?          # e.g. 2years or 2y
-        (?:(?P<months>[0-9]{1,2})(?:months?|m))?   # e.g. 2months or 2m
-        (?:(?P<weeks>[0-9]{1,4})(?:weeks?|w))?     # e.g. 10weeks or 10w
-        (?:(?P<days>[0-9]{1,5})(?:days?|d))?       # e.g. 14days or 10d
-        (?:(?P<hours>[0-9]{1,5})(?:hours?|h))?     # e.g. 12hours or 12h
-    """, re.VERBOSE)
-
-    hours = 0
-    for word in str_input.split():
-        match = compiled.fullmatch(word)
-        if match is None or not match.group(0):
-            raise commands.BadArgument("Invalid time provided.")
-        time_data = {k: int(v) for k, v in match.groupdict(default=0).items()}
-        now = datetime.datetime.utcnow()
-        td = (relativedelta(**time_data) + now) - now
-        hours += td.days * 24 + td.seconds // 3600
+    word_months, hours = _parse_time_string(str_input)
+    if word_months:
+        today = datetime.datetime.utcnow().date()
+        for months in word_months:
+            hours += _months_to_hours(months, today)
     return hours
 
 def license_duration(input_duration: str) -> int:
@@ -2,6 +2,12 @@ from typing import Union
 from discord import Embed, Colour, Member, User
 from helpers import misc
 
+# Fixed embed colours, created once instead of on every call.
+# Only title and colour are shared, a fresh Embed is still constructed per call since
+# Embed.copy() of a prebuilt template is a few times slower than constructing a new one.
+_WARNING_COLOR = Colour.dark_gold()
+_FAILURE_COLOR = Colour.red()
+
 def simple_embed(message: str, title: str, color: Colour) -> Embed:
     embed = Embed(title=title, description=message, color=color)
     return embed
@@ -35,7 +41,7 @@ def warning(message: str) -> Embed:
     :param message: embed description
     :return: Embed object
     """
-    return simple_embed(message, "Warning", Colour.dark_gold())
+    return simple_embed(message, "Warning", _WARNING_COLOR)
 
 def failure(message: str) -> Embed:
     """
@@ -43,4 +49,4 @@ def failure(message: str) -> Embed:
     :param message: embed description
     :return: Embed object
     """
-    return simple_embed(message, "Failure", Colour.red())
\ No newline at end of file
+    return simple_embed(message, "Failure", _FAILURE_COLOR)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import traceback
+from typing import Dict, Iterable, List, Set
+
+from helpers.startup_profiler import StartupProfiler
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExtensionLoader:
+    """
+    Loads extensions in dependency order.
+    Extensions are grouped in waves, each wave contains extensions whose dependencies were all loaded
+    in previous waves, so everything in one wave is loaded concurrently.
+    If an extension fails to load then everything that depends on it is skipped.
+
+    After loading, warm_up runs the warm_up coroutine of every loaded cog that has one, all in parallel.
+    Warm ups are for startup work that doesn't have to block loading, for example waiting for the
+    bot to be ready and then syncing something with the database.
+    """
+
+    def __init__(self, bot, extensions: Dict[str, Iterable[str]], profiler: StartupProfiler, package: str = "cogs"):
+        """
+        :param bot: our discord bot object
+        :param extensions: dict extension name -> names of extensions that have to be loaded before it
+        :param profiler: StartupProfiler where load and warm up times are recorded
+        :param package: package where extensions are located
+        """
+        self.bot = bot
+        self.extensions = {name: tuple(dependencies) for name, dependencies in extensions.items()}
+        self.profiler = profiler
+        self.package = package
+        self.loaded: List[str] = []
+        self.failed: Set[str] = set()
+
+    def load_order(self) -> List[List[str]]:
+        """
+        :return: list of waves, each wave is list of extension names that can be loaded concurrently
+        :raise: ValueError if there is dependency on undeclared extension or there is a dependency cycle
+        """
+        for name, dependencies in self.extensions.items():
+            unknown = set(dependencies) - self.extensions.keys()
+            if unknown:
+                raise ValueError(f"Extension {name} depends on undeclared extension(s) {unknown}")
+
+        remaining = dict(self.extensions)
+        done = set()
+        waves = []
+        while remaining:
+            wave = [name for name, dependencies in remaining.items() if done.issuperset(dependencies)]
+            if not wave:
+                raise ValueError(f"Dependency cycle between extensions {set(remaining)}")
+            for name in wave:
+                del remaining[name]
+            done.update(wave)
+            waves.append(wave)
+        return waves
+
+    async def load_all(self):
+        for wave in self.load_order():
+            await asyncio.gather(*(self._load(name) for name in wave))
+        logger.info(f"Loaded extensions: {', '.join(self.loaded)}")
+        if self.failed:
+            logger.error(f"Failed to load extensions: {', '.join(sorted(self.failed))}")
+
+    async def _load(self, name: str):
+        cog_path = f"{self.package}.{name}"
+        failed_dependencies = self.failed.intersection(self.extensions[name])
+        if failed_dependencies:
+            logger.error(f"Skipping extension {cog_path} because its dependencies failed: {failed_dependencies}")
+            self.failed.add(name)
+            return
+
+        try:
+            with self.profiler.measure_extension(cog_path):
+                await self.bot.load_extension(cog_path)
+        except Exception as e:
+            exc = f"{type(e).__name__}: {e}"
+            logger.error(f"{exc} Failed to load extension {cog_path}")
+            traceback_msg = "".join(traceback.format_exception(type(e), e, e.__traceback__))
+            logger.warning(traceback_msg)
+            self.failed.add(name)
+        else:
+            self.loaded.append(cog_path)
+
+    async def warm_up(self, extension_path: str = None):
+        """
+        Runs warm_up coroutines of loaded cogs in parallel, one failing doesn't stop the others.
+        :param extension_path: str dotted path of extension, if passed only its cogs are warmed up.
+                               Used for extensions loaded or reloaded after startup.
+        """
+        warm_ups = [
+            (name, cog.warm_up) for name, cog in self.bot.cogs.items()
+            if hasattr(cog, "warm_up") and (extension_path is None or _is_in_extension(cog, extension_path))
+        ]
+        results = await asyncio.gather(*(self._warm_up(name, coro) for name, coro in warm_ups),
+                                       return_exceptions=True)
+        for (name, _), result in zip(warm_ups, results):
+            if isinstance(result, Exception):
+                logger.error(f"Warm up of cog {name} failed: {type(result).__name__}: {result}")
+
+    async def _warm_up(self, name: str, warm_up):
+        with self.profiler.measure(f"warm up {name}"):
+            await warm_up()
+
+
+def _is_in_extension(cog, extension_path: str) -> bool:
+    """:return: bool whether cog is defined in the extension module (or its submodules)"""
+    return cog.__module__ == extension_path or cog.__module__.startswith(f"{extension_path}.")
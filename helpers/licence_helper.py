@@ -1,17 +1,84 @@
-import random
+import time
+import zlib
 import string
+import secrets
+from array import array
 from datetime import datetime, timedelta
+from typing import Iterable, List
+
+
+LICENSE_LENGTH = 30
+_CHECKSUM_LENGTH = 3
+_BODY_LENGTH = LICENSE_LENGTH - _CHECKSUM_LENGTH
+_ALPHABET = string.ascii_letters + string.digits
+_ALPHABET_SET = frozenset(_ALPHABET)
+_CHECKSUM_MODULO = len(_ALPHABET) ** _CHECKSUM_LENGTH
+# Random bytes are mapped to alphabet with bytes.translate, bytes >= 248 (62 * 4) are dropped
+# so every character has exactly the same probability (rejection sampling without modulo bias).
+_ACCEPTED_BYTES = len(_ALPHABET) * (256 // len(_ALPHABET))
+_BYTE_TO_CHARACTER = bytes(ord(_ALPHABET[byte % len(_ALPHABET)]) for byte in range(256))
+_REJECTED_BYTES = bytes(range(_ACCEPTED_BYTES, 256))
+
+
+def _random_characters(count: int) -> str:
+    """
+    :param count: int number of characters to generate
+    :return: str of count uniformly random alphabet characters from OS CSPRNG
+    """
+    generated = []
+    missing = count
+    while missing > 0:
+        # Ask for a bit more than needed so rejected bytes usually don't need another round
+        raw = secrets.token_bytes(missing + missing // 16 + 16)
+        characters = raw.translate(_BYTE_TO_CHARACTER, _REJECTED_BYTES)[:missing]
+        generated.append(characters)
+        missing -= len(characters)
+    return b"".join(generated).decode("ascii")
+
+
+def _checksum(body: str) -> str:
+    """:return: str _CHECKSUM_LENGTH alphabet characters derived from body"""
+    value = zlib.crc32(body.encode("ascii")) % _CHECKSUM_MODULO
+    characters = []
+    for _ in range(_CHECKSUM_LENGTH):
+        value, index = divmod(value, len(_ALPHABET))
+        characters.append(_ALPHABET[index])
+    return "".join(characters)
 
 
 def generate_multiple(amount: int) -> list:
+    """
+    Generates licenses from one bulk read of random bytes.
+    License is LICENSE_LENGTH alphabet characters, the last _CHECKSUM_LENGTH of which are checksum of the rest
+    so malformed licenses can be detected without database lookup, see is_well_formed.
+    :param amount: int number of licenses to generate
+    :return: list of str licenses
+    """
+    characters = _random_characters(amount * _BODY_LENGTH)
     licenses = []
-    for _ in range(amount):
-        licenses.append(generate_single())
+    for start in range(0, len(characters), _BODY_LENGTH):
+        body = characters[start:start + _BODY_LENGTH]
+        licenses.append(body + _checksum(body))
     return licenses
 
 
 def generate_single() -> str:
-    return "".join(random.choices(string.ascii_letters + string.digits, k=30))
+    return generate_multiple(1)[0]
+
+
+def is_well_formed(license: str, require_checksum: bool = False) -> bool:
+    """
+    Cheap check done before database lookup.
+    :param license: str license to check
+    :param require_checksum: bool if True license also needs valid checksum. Licenses generated before
+                             checksums were added don't have it so enable only if none of them are still in use.
+    :return: bool False if license can't possibly exist
+    """
+    if len(license) != LICENSE_LENGTH or not _ALPHABET_SET.issuperset(license):
+        return False
+    if require_checksum:
+        return _checksum(license[:_BODY_LENGTH]) == license[_BODY_LENGTH:]
+    return True
 
 
 def construct_expiration_date(license_duration_hours: int) -> datetime:
@@ -32,13 +99,7 @@ def get_remaining_time(expiration_date: str) -> str:
     :return: timedelta difference between expiration_date and current time
 
     """
-    # Convert string to datetime
-    expiration_datetime = datetime.strptime(expiration_date, "%Y-%m-%d %H:%M:%S.%f")
-    # timedelta object
-    difference = expiration_datetime - get_current_time()
-    # difference has ms in it so we remove it here for nicer display
-    difference = str(difference).split(".")[0]
-    return difference
+    return format_remaining_time(date_string_to_timestamp(expiration_date))
 
 
 def get_current_time() -> datetime:
@@ -50,3 +111,66 @@ def get_current_time() -> datetime:
     possibly never expire!)
     """
     return datetime.now()
+
+
+# Epoch time API #########################################################################
+# Timestamps are int seconds since epoch (UTC) so they can be compared and stored in arrays without any parsing.
+# Expiration dates in database are still strings of naive local time (see get_current_time),
+# use the conversion functions below for them.
+
+def get_current_timestamp() -> int:
+    return int(time.time())
+
+
+def construct_expiration_timestamp(license_duration_hours: int) -> int:
+    """
+    :param license_duration_hours: int hours to be added to current time
+    :return: int timestamp of current time incremented by param license_duration_hours
+    """
+    return get_current_timestamp() + license_duration_hours * 3600
+
+
+def format_remaining_time(expiration_timestamp: int, now: int = None) -> str:
+    """
+    :param expiration_timestamp: int timestamp
+    :param now: int current timestamp, taken if not passed
+    :return: str time left until expiration, format '[D day(s), ]H:MM:SS'
+    """
+    if now is None:
+        now = get_current_timestamp()
+    return str(timedelta(seconds=expiration_timestamp - now))
+
+
+def date_string_to_timestamp(date: str) -> int:
+    """
+    Converts expiration date in the old string format to timestamp.
+    :param date: str in format Y-M-D H:M:S[.mS], naive (get_current_time time) or with UTC offset
+    :return: int timestamp
+    :raise: ValueError if param date is not in valid format
+    """
+    return int(datetime.fromisoformat(date).timestamp())
+
+
+def timestamp_to_date_string(timestamp: int) -> str:
+    """:return: str naive local time in format Y-M-D H:M:S, same as str(get_current_time()) but without mS"""
+    return str(datetime.fromtimestamp(timestamp))
+
+
+def date_strings_to_timestamps(dates: Iterable[str]) -> array:
+    """
+    Batch version of date_string_to_timestamp.
+    :return: array of int64 timestamps, in the same order as param dates
+    """
+    return array("q", map(date_string_to_timestamp, dates))
+
+
+def get_expired_indexes(expiration_timestamps: array, now: int = None) -> List[int]:
+    """
+    Compares all expirations against current time in one pass.
+    :param expiration_timestamps: array (or any sequence) of int timestamps
+    :param now: int current timestamp, taken if not passed
+    :return: list of indexes of expired timestamps (ones that are in the past)
+    """
+    if now is None:
+        now = get_current_timestamp()
+    return [index for index, timestamp in enumerate(expiration_timestamps) if timestamp < now]
@@ -1,14 +1,45 @@
 import os
+import sys
 import logging
+import importlib.util
 from pathlib import Path
+from types import ModuleType
+from typing import Dict, Optional
 
-import timeago as timesince
 from discord import Embed, Colour
 
 
 logger = logging.getLogger(__name__)
 
 
+def lazy_import(module_name: str) -> ModuleType:
+    """
+    Returns module that is only really imported (executed) on first attribute access.
+    Used for heavy dependencies that are needed only by rarely used commands so they don't slow down startup.
+    If the module is already imported it's returned as is.
+    :param module_name: full dotted module name, example 'dateutil.parser'
+    :return: module object
+    :raise: ModuleNotFoundError if the module can't be found, this is checked right away and not on first use
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.find_spec(module_name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{module_name}'", name=module_name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    loader.exec_module(module)
+    parent_name, _, child_name = module_name.rpartition(".")
+    if parent_name:
+        setattr(sys.modules[parent_name], child_name, module)
+    return module
+
+
+timesince = lazy_import("timeago")
+
+
 def construct_load_bar_string(percent, message=None, size=None):
     if size is None:
         size = 10
@@ -38,20 +69,45 @@ def construct_load_bar_string(percent, message=None, size=None):
     return constructed
 
 
-def get_top_role_color(member):
+# Guild id -> {member id -> resolved embed colour}
+# Usually holds just our bot member per guild since that's what is passed for embed colours.
+_top_role_colors: Dict[int, Dict[int, Colour]] = {}
+# Colour objects are never mutated so the same instance can be shared by all embeds
+_DEFAULT_ROLE_COLOR = Colour.default()
+_FALLBACK_COLOR = Colour.green()
+
+
+def get_top_role_color(member) -> Optional[Colour]:
     """
-    Tries to get member top role color and if fails return Embed.Empty - This makes it work in DMs.
+    Tries to get member top role color and if fails returns None (no color) - This makes it work in DMs.
     If the top role has default role color then returns green color (marking success)
+    Resolved colors are cached per guild, see invalidate_top_role_color for when they are dropped.
     """
     try:
-        color = member.top_role.color
-        if color == Colour.default():
-            return Colour.green()
-        else:
-            return member.top_role.color
+        guild_colors = _top_role_colors.setdefault(member.guild.id, {})
     except AttributeError:
         # Fix for DMs
-        return Embed.Empty
+        return None
+
+    color = guild_colors.get(member.id)
+    if color is None:
+        color = member.top_role.color
+        if color == _DEFAULT_ROLE_COLOR:
+            color = _FALLBACK_COLOR
+        guild_colors[member.id] = color
+    return color
+
+
+def invalidate_top_role_color(guild_id: int, member_id: int = None):
+    """
+    Drops cached top role colors, should be called whenever roles in guild or roles of member change.
+    :param guild_id: int guild to invalidate
+    :param member_id: int member to invalidate, if None colors of all members in guild are invalidated
+    """
+    if member_id is None:
+        _top_role_colors.pop(guild_id, None)
+    else:
+        _top_role_colors.get(guild_id, {}).pop(member_id, None)
 
 
 def construct_embed(author, description=None, **kwargs):
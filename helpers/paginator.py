@@ -1,4 +1,13 @@
-from asyncio import TimeoutError
+import math
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from discord import ui
+
+logger = logging.getLogger(__name__)
 
 _MAX_MSG_SIZE = 2000
 _ARROW_TO_BEGINNING = "\u23ee"
@@ -7,6 +16,261 @@ _ARROW_FORWARD = "\u25b6"
 _ARROW_TO_END = "\u23ed"
 _PAGINATION_EMOJIS = (_ARROW_TO_BEGINNING, _ARROW_BACKWARD, _ARROW_FORWARD, _ARROW_TO_END)
 _TIMEOUT = 120
+_TICK_SECONDS = 1
+_TIMEOUT_TICKS = _TIMEOUT // _TICK_SECONDS
+
+
+class PageSource(ABC):
+    """
+    Source of paginator pages.
+    Pages are requested by index only when they're about to be shown so sources can render them lazily.
+    """
+
+    @abstractmethod
+    async def get_page(self, index: int) -> str:
+        """
+        :param index: int page index, starting from 0
+        :return: str page content
+        :raise: IndexError if there is no page with that index
+        """
+
+    async def has_page(self, index: int) -> bool:
+        try:
+            await self.get_page(index)
+        except IndexError:
+            return False
+        return True
+
+    @abstractmethod
+    async def get_page_count(self) -> int:
+        """Can be expensive since it can require rendering all of the pages."""
+
+    def known_page_count(self) -> Optional[int]:
+        """:return: int page count if it's known without rendering anything, None otherwise"""
+        return None
+
+
+class StringPageSource(PageSource):
+    """
+    Pages are chunks of a string (see Paginator.iter_chunks).
+    Chunks are generated only up to the requested page and the generated ones are kept.
+    """
+
+    def __init__(self, string, title, separator, max_page_size):
+        self._chunks = Paginator.iter_chunks(title, string, separator, max_page_size)
+        self._pages = []
+        self._exhausted = False
+
+    def _generate_up_to(self, index: int):
+        while not self._exhausted and len(self._pages) <= index:
+            try:
+                self._pages.append(next(self._chunks))
+            except StopIteration:
+                self._exhausted = True
+
+    async def get_page(self, index: int) -> str:
+        self._generate_up_to(index)
+        return self._pages[index]
+
+    async def get_page_count(self) -> int:
+        self._generate_up_to(float("inf"))
+        return len(self._pages)
+
+    def known_page_count(self) -> Optional[int]:
+        return len(self._pages) if self._exhausted else None
+
+
+class RowPageSource(PageSource):
+    """
+    Pages are groups of rows, each page is rendered only when it's shown.
+    Subclasses define how rows of a page are fetched.
+    """
+
+    def __init__(self, render: Callable[[Sequence], str], rows_per_page: int, title: str = "",
+                 total_rows: Optional[int] = None):
+        """
+        :param render: function that renders list of rows to page content
+        :param rows_per_page: int, has to be small enough for rendered page to fit in one message
+        :param title: Shows at the top of every page
+        :param total_rows: int total number of rows if known, used for page count
+        """
+        self._render = render
+        self.rows_per_page = rows_per_page
+        self.title = title
+        self.total_rows = total_rows
+        self._rendered: Dict[int, str] = {}
+
+    @abstractmethod
+    async def _fetch_rows(self, index: int) -> Sequence:
+        """:return: rows of page with param index, empty if there is no such page"""
+
+    async def get_page(self, index: int) -> str:
+        if index in self._rendered:
+            return self._rendered[index]
+        known_page_count = self.known_page_count()
+        if index < 0 or (known_page_count is not None and index >= known_page_count):
+            raise IndexError(f"Page {index} out of range")
+        rows = await self._fetch_rows(index)
+        # First page is always shown, even if empty
+        if not rows and index > 0:
+            if self.total_rows is not None:
+                # Rows were deleted since counting them, page count is found by fetching from now on
+                self.total_rows = None
+            raise IndexError(f"Page {index} out of range")
+        page = self.title + self._render(rows)
+        self._rendered[index] = page
+        return page
+
+    async def get_page_count(self) -> int:
+        known_page_count = self.known_page_count()
+        if known_page_count is not None:
+            return known_page_count
+        index = len(self._rendered)
+        while await self.has_page(index):
+            index += 1
+        return max(index, 1)
+
+    def known_page_count(self) -> Optional[int]:
+        if self.total_rows is None:
+            return None
+        return max(math.ceil(self.total_rows / self.rows_per_page), 1)
+
+
+class ListPageSource(RowPageSource):
+    """Rows are already in memory, only rendering is done per page."""
+
+    def __init__(self, rows: Sequence, render: Callable[[Sequence], str], rows_per_page: int, title: str = ""):
+        super().__init__(render, rows_per_page, title, total_rows=len(rows))
+        self._rows = rows
+
+    async def _fetch_rows(self, index: int) -> Sequence:
+        start = index * self.rows_per_page
+        return self._rows[start:start + self.rows_per_page]
+
+
+class KeysetPageSource(RowPageSource):
+    """
+    Rows are fetched from the database one page at a time with keyset pagination.
+    Each page query continues after the key of the last row of the previous page
+    so fetching any page costs the same, no matter how deep it is.
+    """
+
+    def __init__(self, fetch: Callable[[Any, int], Awaitable[List]], render: Callable[[Sequence], str],
+                 rows_per_page: int, title: str = "", total_rows: Optional[int] = None,
+                 first_key: Any = "", key_index: int = 0):
+        """
+        :param fetch: coroutine function(after_key, limit) returning rows ordered by key
+        :param first_key: key that is smaller than all keys, used for the first page
+        :param key_index: index of the key column in rows
+        """
+        super().__init__(render, rows_per_page, title, total_rows)
+        self._fetch = fetch
+        self._first_key = first_key
+        self._key_index = key_index
+        # Page index -> key of its last row, page after it starts after that key
+        self._page_end_keys: Dict[int, Any] = {}
+
+    async def _fetch_rows(self, index: int) -> Sequence:
+        # Pages are usually visited in order, but jumping ahead needs keys of all pages in between.
+        # Walk starts from the nearest page before index with known end key and pages fetched on the way
+        # are rendered right away so they're not queried again when visited.
+        page = max((known for known in self._page_end_keys if known < index), default=-1)
+        while True:
+            after_key = self._first_key if page < 0 else self._page_end_keys[page]
+            page += 1
+            rows = await self._fetch(after_key, self.rows_per_page)
+            if rows:
+                self._page_end_keys[page] = rows[-1][self._key_index]
+            if page == index or not rows:
+                return rows
+            self._rendered.setdefault(page, self.title + self._render(rows))
+
+
+class _TimerWheel:
+    """
+    Hashed timer wheel, each slot holds keys that expire on the same tick.
+    Scheduling, rescheduling, cancelling and expiring are all O(1) per key.
+    Delay has to be shorter than the number of slots.
+    """
+
+    def __init__(self, slot_count: int):
+        self._slots = [set() for _ in range(slot_count)]
+        self._key_slots = {}
+        self._current_slot = 0
+
+    def __len__(self):
+        return len(self._key_slots)
+
+    def schedule(self, key, ticks: int):
+        self.cancel(key)
+        slot = (self._current_slot + ticks) % len(self._slots)
+        self._slots[slot].add(key)
+        self._key_slots[key] = slot
+
+    def cancel(self, key):
+        slot = self._key_slots.pop(key, None)
+        if slot is not None:
+            self._slots[slot].discard(key)
+
+    def tick(self) -> set:
+        """Advances the wheel for one tick and returns keys that expired."""
+        self._current_slot = (self._current_slot + 1) % len(self._slots)
+        expired = self._slots[self._current_slot]
+        self._slots[self._current_slot] = set()
+        for key in expired:
+            del self._key_slots[key]
+        return expired
+
+
+class PaginatorSessionManager:
+    """
+    Handles expiry of all active paginators.
+    Button clicks are dispatched by discord.py view store which is a lookup by message ID, so the cost of
+    every click is O(1) no matter how many sessions are open.
+    Sessions expire after _TIMEOUT seconds of inactivity, expiry is tracked with a timer wheel.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._sessions: Dict[int, "Paginator"] = {}
+        self._timeouts = _TimerWheel(_TIMEOUT_TICKS + 1)
+        self._task = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def start(self):
+        self._task = self.bot.loop.create_task(self._run())
+
+    def add(self, session: "Paginator"):
+        self._sessions[session.message.id] = session
+        self.touch(session.message.id)
+
+    def touch(self, message_id: int):
+        """Activity resets the timeout of session."""
+        if message_id in self._sessions:
+            self._timeouts.schedule(message_id, _TIMEOUT_TICKS)
+
+    async def _run(self):
+        # On shutdown this task is cancelled and all sessions are closed
+        with self.bot.shutdown.track("paginator sessions", on_shutdown=self._task.cancel):
+            try:
+                while True:
+                    await asyncio.sleep(_TICK_SECONDS)
+                    expired = self._timeouts.tick()
+                    if expired:
+                        await self._close_sessions(expired)
+            except asyncio.CancelledError:
+                closed_count = len(self._sessions)
+                await self._close_sessions(tuple(self._sessions))
+                logger.info(f"Closed {closed_count} paginator sessions.")
+                raise
+
+    async def _close_sessions(self, message_ids):
+        sessions = [self._sessions.pop(message_id) for message_id in message_ids if message_id in self._sessions]
+        for message_id in message_ids:
+            self._timeouts.cancel(message_id)
+        await asyncio.gather(*(session.close() for session in sessions))
 
 
 class Paginator:
@@ -16,8 +280,14 @@ class Paginator:
     (and codeblock in embed for some darn reason limits it's line length making my output broken).
     It would be prettier to use embeds but as they really don't like codeblocks I was forced to make this.
 
-    """
+    One Paginator object is one paginator session, navigation and expiry are handled by PaginatorSessionManager.
+    Pages are requested from the PageSource only when they're shown.
 
+    Navigation uses buttons, the navbar is sent with the first page and every click is answered
+    with one interaction response.
+    Rapid navigation is coalesced, while a page edit is in flight clicks only move the target page
+    and once the edit is done only the latest target page is sent.
+    """
     @classmethod
     async def paginate(cls, bot, user, output, string, title="", separator="\n", prefix="```", suffix="```"):
         """"
@@ -25,9 +295,9 @@ class Paginator:
         To correctly create this object you need to call :
             await Paginator.paginate()
 
-        :param bot: our discord bot object. Used for wait_for
+        :param bot: our discord bot object. Used for its paginator session manager
         :param user: discord member/user object who invoked the command which output is going to be paginated.
-                     Used for checking if the reaction added to navbar is from this member (only he can
+                     Used for checking if the navbar button was clicked by this member (only he can
                      navigate trough paginator)
         :param output: discord channel/user to where the paginator is going to be sent
         :param string: string to paginate
@@ -37,74 +307,108 @@ class Paginator:
         :param suffix: string suffix of every page of paginator, example "```"
 
         """
-        self = Paginator(user, output, string, title, separator, prefix, suffix)
+        source = StringPageSource(string, title, separator, cls.max_page_size(prefix, suffix, title))
+        await cls.paginate_source(bot, user, output, source, prefix=prefix, suffix=suffix)
+
+    @classmethod
+    async def paginate_source(cls, bot, user, output, source: PageSource, prefix="```", suffix="```"):
+        """
+        Same as paginate but pages come from param source.
+        Returns as soon as the first page is sent, navigation is handled by bot.paginators.
+        """
+        self = Paginator(user, output, source, prefix, suffix, bot.paginators)
         await self.make_message()
-        await self.start_listener(bot, user, self.message)
+        if self.paginating:
+            bot.paginators.add(self)
+
+    @staticmethod
+    def max_page_size(prefix, suffix, title=""):
+        """:return: int maximum size of page content so that the whole message fits in one discord message"""
+        return _MAX_MSG_SIZE - len(prefix) - len(suffix) - len(title) - Paginator.page_counter_suffix_string_length()
 
-    def __init__(self, user, output, string, title, separator, prefix, suffix):
+    def __init__(self, user, output, source, prefix, suffix, sessions: PaginatorSessionManager = None):
         self.user = user
         self.output = output
+        self.source = source
         self.prefix = prefix
         self.suffix = suffix
-        self._max_msg_size = _MAX_MSG_SIZE - len(prefix) - len(suffix) - len(title) - Paginator.page_counter_suffix_string_length()
-        self.chunk_index = 0
-        self.chunks = Paginator.make_chunks(title, string, separator, self._max_msg_size)
-        self.paginating = sum(map(len, self.chunks)) > self._max_msg_size
+        self.sessions = sessions
+        # Page that navigation targets, page that is shown can lag behind while edit is in flight
+        self.page_index = 0
+        self._shown_page_index = 0
+        self._updating = False
+        self.paginating = False
         self.message = None
+        self._view = None
 
     @staticmethod
     def make_chunks(title, string, separator, max_msg_size):
         """
-        Basically splits param string based on param separator and adds each entry from that list
+        Returns list of all chunks, see iter_chunks.
+        """
+        return list(Paginator.iter_chunks(title, string, separator, max_msg_size))
+
+    @staticmethod
+    def iter_chunks(title, string, separator, max_msg_size):
+        """
+        Basically splits param string based on param separator and adds each entry
         to a temp list. Once the length of that temp list is going to exceed the param max_msg_size
         (not the length of list but the combined length of string elements in that temp list)
-        add it to constructed_chunks and reset temp list.
+        yield it and reset temp list.
         Repeat until done.
 
-        Also deals with elements which are too long even after split by calling function break_long_entries.
+        Single pass, combined length of temp list is tracked as we go so each entry is only looked at once.
+        Entries which are too long even after split are broken down by iter_entries.
 
-        Returns constructed_chunks
+        Yields chunks one by one so pages can be generated lazily.
         """
-        constructed_chunks = []
-        chunk_list = string.split(separator)
-        Paginator.break_long_entries(chunk_list, max_msg_size)
         temp_chunk = []
-        for entry in chunk_list:
+        temp_chunk_length = 0
+        for entry in Paginator.iter_entries(string, separator, max_msg_size):
             # len(temp_chunk) is because we'll add separators in join
-            if sum(map(len, temp_chunk)) + len(entry) + len(temp_chunk) >= max_msg_size:
-                constructed_chunks.append(title + separator.join(temp_chunk))
+            if temp_chunk_length + len(entry) + len(temp_chunk) >= max_msg_size:
+                yield title + separator.join(temp_chunk)
                 temp_chunk = [entry]
+                temp_chunk_length = len(entry)
             else:
                 temp_chunk.append(entry)
+                temp_chunk_length += len(entry)
 
         # For leftovers
-        constructed_chunks.append(title + separator.join(temp_chunk))
-        return constructed_chunks
+        yield title + separator.join(temp_chunk)
 
     @staticmethod
-    def break_long_entries(chunk_list, max_msg_size):
-        """
-        We further break down chunk_list in case any of the entries are larger than max_msg_size
-        Modifies passed list in place!
-        Will throw RecursionError if the string length in list is mega-huge.
-        Basically when the entry is found just split it in half and re-add it in list without breaking order.
-        Split in half will be done as many times as needed as long as resulting entry is larger than max_msg_size
-        :param chunk_list: list of strings
-        :param max_msg_size: integer, if entry is larger that this we break it down
-
-        """
-        for i, entry in enumerate(chunk_list):
-            if len(entry) >= max_msg_size:
-                # Split string in 2 parts by the middle
-                f, s = entry[:len(entry)//2], entry[len(entry)//2:]
-                # Append them back to our list, not breaking order
-                chunk_list[i] = s
-                chunk_list.insert(i, f)
-                # Keep doing that until there is no entries that are larger in length than max_msg_size
-                Paginator.break_long_entries(chunk_list, max_msg_size)
-
-    def page_counter_suffix(self):
-        page_count = f"Page[{self.chunk_index + 1}/{len(self.chunks)}]"
+    def iter_entries(string, separator, max_msg_size):
+        """
+        Lazily splits param string by param separator (same entries as str.split).
+        Entries that are not shorter than max_msg_size are further split at fixed offsets
+        into pieces of max_msg_size - 1 characters so each of them fits in a chunk.
+        :param string: string to split
+        :param separator: non empty string to split on
+        :param max_msg_size: integer, entries of this length or longer are broken down
+        :raise: ValueError if separator is empty
+        """
+        if not separator:
+            raise ValueError("empty separator")
+        piece_size = max(max_msg_size - 1, 1)
+        separator_length = len(separator)
+        start = 0
+        while True:
+            end = string.find(separator, start)
+            entry_end = len(string) if end == -1 else end
+            if entry_end - start < max_msg_size:
+                yield string[start:entry_end]
+            else:
+                for offset in range(start, entry_end, piece_size):
+                    yield string[offset:min(offset + piece_size, entry_end)]
+            if end == -1:
+                return
+            start = end + separator_length
+
+    def page_counter_suffix(self, page_index: int = None):
+        page_index = self.page_index if page_index is None else page_index
+        page_count = self.source.known_page_count()
+        page_count = f"Page[{page_index + 1}/{'?' if page_count is None else page_count}]"
         return f"\n\n{page_count}{self.suffix}"
 
     @staticmethod
@@ -113,78 +417,90 @@ class Paginator:
         return 13
 
     async def make_message(self):
+        first_page = await self.source.get_page(0)
+        self.paginating = await self.source.has_page(1)
         if self.paginating:
-            self.message = await self.output.send(f"{self.prefix}{self.chunks[0]}{self.page_counter_suffix()}")
-            await self._add_reactions()
+            self._view = self._make_view()
+            self.message = await self.output.send(
+                f"{self.prefix}{first_page}{self.page_counter_suffix()}", view=self._view
+            )
         else:
             # Don't add counter if there is only 1 page
-            self.message = await self.output.send(f"{self.prefix}{self.chunks[0]}{self.suffix}")
+            self.message = await self.output.send(f"{self.prefix}{first_page}{self.suffix}")
 
-    async def _add_reactions(self):
+    def _make_view(self):
+        # Session manager handles the timeout
+        view = ui.View(timeout=None)
         for emoji in _PAGINATION_EMOJIS:
-            await self.message.add_reaction(emoji)
+            button = ui.Button(emoji=emoji)
+            button.callback = partial(self._on_button_click, emoji)
+            view.add_item(button)
+        return view
 
-    async def clear_reactions(self):
+    async def _on_button_click(self, emoji, interaction):
+        if interaction.user.id != self.user.id:
+            await interaction.response.defer()
+            return
+        if self.sessions is not None:
+            self.sessions.touch(self.message.id)
+        await self.navigate(emoji, interaction)
+
+    async def close(self):
+        """Ends the session by removing the navbar."""
+        self.paginating = False
+        self._view.stop()
         try:
-            await self.message.clear_reactions()
+            await self.message.edit(view=None)
         except Exception:
-            # Silently ignore if no permission to remove reaction.
+            # Silently ignore if message was deleted.
             pass
 
-    async def update_message(self):
-        await self.message.edit(content=f"{self.prefix}{self.chunks[self.chunk_index]}{self.page_counter_suffix()}")
+    async def update_message(self, interaction=None):
+        """
+        Shows the page at page_index, coalescing rapid navigation.
+        If an update is already running it will pick up the new page_index once its edit is done,
+        so there is at most one edit in flight and intermediate pages are never sent.
+        :param interaction: button interaction that triggered the update, if any. It's used to send the
+                            edit as interaction response (or acknowledged if edit is not needed).
+        """
+        if not self._updating:
+            self._updating = True
+            try:
+                while self._shown_page_index != self.page_index:
+                    page_index = self.page_index
+                    try:
+                        page = await self.source.get_page(page_index)
+                    except IndexError:
+                        # Page count was stale (rows deleted while paginating), go to the last page that exists.
+                        # First page always exists so this ends.
+                        self.page_index = min(await self.source.get_page_count(), page_index) - 1
+                        continue
+                    content = f"{self.prefix}{page}{self.page_counter_suffix(page_index)}"
+                    if interaction is not None and not interaction.response.is_done():
+                        await interaction.response.edit_message(content=content)
+                    else:
+                        await self.message.edit(content=content)
+                    self._shown_page_index = page_index
+            finally:
+                self._updating = False
 
-    async def _remove_reaction(self, reaction):
-        try:
-            await self.message.remove_reaction(reaction, self.user)
-        except Exception:
-            # Silently ignore if no permission to remove reaction. (example DM)
-            pass
+        if interaction is not None and not interaction.response.is_done():
+            await interaction.response.defer()
 
-    async def start_listener(self, bot, user, message):
-        def react_check(reaction_, user_):
-            return str(reaction_) in _PAGINATION_EMOJIS and user_.id == user.id and reaction_.message.id == message.id
+    async def navigate(self, emoji, interaction):
+        """
+        Changes the page depending on the navigation emoji that was clicked.
+        :param emoji: str one of _PAGINATION_EMOJIS
+        :param interaction: button interaction of the click, used to respond with the edit
+        """
+        if emoji == _ARROW_TO_BEGINNING:
+            self.page_index = 0
+        elif emoji == _ARROW_BACKWARD:
+            self.page_index = max(self.page_index - 1, 0)
+        elif emoji == _ARROW_FORWARD:
+            if await self.source.has_page(self.page_index + 1):
+                self.page_index += 1
+        else:
+            self.page_index = await self.source.get_page_count() - 1
 
-        while self.paginating:
-            try:
-                reaction, user = await bot.wait_for("reaction_add", check=react_check, timeout=_TIMEOUT)
-            except TimeoutError:
-                self.paginating = False
-                await self.clear_reactions()
-                break
-
-            if str(reaction) == _ARROW_TO_BEGINNING:
-                if self.chunk_index == 0:
-                    await self._remove_reaction(_ARROW_TO_BEGINNING)
-                    continue
-                else:
-                    self.chunk_index = 0
-                    await self.update_message()
-                    await self._remove_reaction(_ARROW_TO_BEGINNING)
-
-            elif str(reaction) == _ARROW_BACKWARD:
-                if self.chunk_index == 0:
-                    await self._remove_reaction(_ARROW_BACKWARD)
-                    continue
-                else:
-                    self.chunk_index -= 1
-                await self.update_message()
-                await self._remove_reaction(_ARROW_BACKWARD)
-
-            elif str(reaction) == _ARROW_FORWARD:
-                if self.chunk_index == len(self.chunks) - 1:
-                    await self._remove_reaction(_ARROW_FORWARD)
-                    continue
-                else:
-                    self.chunk_index += 1
-                await self.update_message()
-                await self._remove_reaction(_ARROW_FORWARD)
-
-            elif str(reaction) == _ARROW_TO_END:
-                if self.chunk_index == len(self.chunks) - 1:
-                    await self._remove_reaction(_ARROW_TO_END)
-                    continue
-                else:
-                    self.chunk_index = len(self.chunks) - 1
-                await self.update_message()
-                await self._remove_reaction(_ARROW_TO_END)
+        await self.update_message(interaction)
@@ -0,0 +1,149 @@
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from helpers.errors import RateLimited
+
+
+class SlidingWindowCounter:
+    """
+    Sliding window rate limit per key, approximated from two fixed windows:
+    count = previous window count * part of previous window still in the sliding window + current window count.
+    Each key only needs [window index, previous count, current count] no matter how many hits it has.
+    """
+
+    def __init__(self, limit: int, window: float):
+        """
+        :param limit: int maximum number of hits in any window long period
+        :param window: float window length in seconds
+        """
+        self.limit = limit
+        self.window = window
+        self._counters: Dict[Hashable, List[int]] = {}
+
+    def __len__(self):
+        return len(self._counters)
+
+    def _get_counter(self, key: Hashable, window_index: int) -> List[int]:
+        counter = self._counters.get(key)
+        if counter is None or counter[0] < window_index - 1:
+            counter = self._counters[key] = [window_index, 0, 0]
+        elif counter[0] == window_index - 1:
+            counter[0], counter[1], counter[2] = window_index, counter[2], 0
+        return counter
+
+    def hit(self, key: Hashable, now: float) -> float:
+        """
+        Counts a hit if it's allowed.
+        :param key: hashable, example user id
+        :param now: float current monotonic time in seconds
+        :return: float 0 if allowed, otherwise seconds after which the hit would be allowed
+        """
+        window_index = int(now // self.window)
+        _, previous, current = counter = self._get_counter(key, window_index)
+        window_progress = now / self.window - window_index
+        if previous * (1 - window_progress) + current + 1 <= self.limit:
+            counter[2] += 1
+            return 0.0
+        return self._retry_after(previous, current, window_index, now)
+
+    def _retry_after(self, previous: int, current: int, window_index: int, now: float) -> float:
+        allowed = self.limit - 1
+        if current <= allowed and previous:
+            # Enough of the previous window will slide out while still in the current window
+            progress_needed = 1 - (allowed - current) / previous
+            return max((window_index + progress_needed) * self.window - now, 0.0)
+        # Current window becomes previous one
+        progress_needed = 1 - allowed / current if current else 0.0
+        return max((window_index + 1 + progress_needed) * self.window - now, 0.0)
+
+    def evict(self, now: float):
+        """Removes keys with no hits in the last two windows, their count is 0 anyway."""
+        oldest_index = int(now // self.window) - 1
+        stale = [key for key, counter in self._counters.items() if counter[0] < oldest_index]
+        for key in stale:
+            del self._counters[key]
+
+
+class RedeemRateLimiter:
+    """
+    Limits license redeem attempts per user, per guild and globally with sliding windows.
+    Users that keep trying invalid licenses are blocked for progressively longer (doubling each failure).
+    Stale entries are evicted once per window when hit is called so memory stays proportional to recent users.
+    """
+
+    def __init__(self, user_limit: int = 5, guild_limit: int = 30, global_limit: int = 300, window: float = 60.0,
+                 free_failures: int = 3, backoff_base: float = 10.0, backoff_max: float = 3600.0):
+        """
+        :param user_limit: int attempts per user per window
+        :param guild_limit: int attempts per guild per window
+        :param global_limit: int attempts per window for the whole bot
+        :param window: float window length in seconds
+        :param free_failures: int consecutive failed attempts before backoff kicks in
+        :param backoff_base: float seconds of block after the first failure over free_failures, doubled after each
+        :param backoff_max: float maximum block in seconds
+        """
+        self.window = window
+        self._users = SlidingWindowCounter(user_limit, window)
+        self._guilds = SlidingWindowCounter(guild_limit, window)
+        self._global = SlidingWindowCounter(global_limit, window)
+        self.free_failures = free_failures
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # user id -> (consecutive failures, monotonic time of the last failure)
+        self._failures: Dict[int, Tuple[int, float]] = {}
+        self._last_eviction = time.monotonic()
+
+    def hit(self, user_id: int, guild_id: Optional[int]):
+        """
+        Call before every attempt.
+        :param user_id: int id of user attempting
+        :param guild_id: int id of guild where it was attempted, None for DMs
+        :raise: RateLimited if any of the limits is exceeded
+        """
+        now = time.monotonic()
+        if now - self._last_eviction >= self.window:
+            self._evict(now)
+
+        blocked_for = self._blocked_for(user_id, now)
+        if blocked_for:
+            raise RateLimited("Too many invalid attempts.", blocked_for)
+        # User limit first so one user can't use up the guild/global limit
+        retry_after = self._users.hit(user_id, now)
+        if not retry_after and guild_id is not None:
+            retry_after = self._guilds.hit(guild_id, now)
+        if not retry_after:
+            retry_after = self._global.hit(None, now)
+        if retry_after:
+            raise RateLimited("Too many attempts.", retry_after)
+
+    def _backoff(self, failures: int) -> float:
+        """:return: float seconds user is blocked for after param failures consecutive failures"""
+        if failures <= self.free_failures:
+            return 0.0
+        return min(self.backoff_base * 2 ** (failures - self.free_failures - 1), self.backoff_max)
+
+    def _blocked_for(self, user_id: int, now: float) -> float:
+        failures, last_failure = self._failures.get(user_id, (0, 0.0))
+        return max(last_failure + self._backoff(failures) - now, 0.0)
+
+    def record_failure(self, user_id: int):
+        """Call after failed attempt (invalid license)."""
+        failures, _ = self._failures.get(user_id, (0, 0.0))
+        self._failures[user_id] = (failures + 1, time.monotonic())
+
+    def record_success(self, user_id: int):
+        self._failures.pop(user_id, None)
+
+    def _evict(self, now: float):
+        self._last_eviction = now
+        for counter in (self._users, self._guilds, self._global):
+            counter.evict(now)
+        # Failures are forgotten once user has not failed for longer than the maximum backoff
+        stale = [user_id for user_id, (_, last_failure) in self._failures.items()
+                 if now - last_failure > self.backoff_max]
+        for user_id in stale:
+            del self._failures[user_id]
+
+    def __repr__(self):
+        return (f"<RedeemRateLimiter users={len(self._users)} guilds={len(self._guilds)} "
+                f"failing_users={len(self._failures)}>")
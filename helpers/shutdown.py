@@ -0,0 +1,141 @@
+import json
+import asyncio
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from helpers.licence_helper import get_current_time
+
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedWork:
+    __slots__ = ("kind", "task", "on_shutdown")
+
+    def __init__(self, kind: str, task: asyncio.Task, on_shutdown: Optional[Callable[[], None]]):
+        self.kind = kind
+        self.task = task
+        self.on_shutdown = on_shutdown
+
+
+class ShutdownReport:
+    def __init__(self, drained: Dict[str, int], abandoned: Dict[str, int], duration: float):
+        self.drained = drained
+        self.abandoned = abandoned
+        self.duration = duration
+
+    def __str__(self):
+        drained = ", ".join(f"{kind}: {count}" for kind, count in self.drained.items()) or "nothing"
+        abandoned = ", ".join(f"{kind}: {count}" for kind, count in self.abandoned.items()) or "nothing"
+        return f"Drained {drained}. Abandoned {abandoned}. Took {self.duration:.2f}s."
+
+    def to_dict(self) -> dict:
+        return {"drained": self.drained, "abandoned": self.abandoned, "duration": self.duration}
+
+
+class ShutdownCoordinator:
+    """
+    Keeps track of in-flight work (expiry passes, paginator sessions..) so shutdown can wait for it.
+
+    Work is registered with track() from inside the task doing the work.
+    On drain:
+        - shutting_down is set so no new commands or work is started
+        - on_shutdown callbacks of tracked work are called so long waiting work can wrap up early
+        - we wait for all tracked work up to the deadline, what's still running after it is cancelled
+        - checkpoint with the report is saved so the next start knows what was abandoned
+    """
+    CHECKPOINT_PATH = Path("databases/shutdown_checkpoint.json")
+
+    def __init__(self):
+        self.shutting_down = False
+        self.report: Optional[ShutdownReport] = None
+        self._work: List[_TrackedWork] = []
+
+    @contextmanager
+    def track(self, kind: str, on_shutdown: Callable[[], None] = None):
+        """
+        Tracks the current task for the duration of the with block.
+        :param kind: str description of work used in report, example 'expiry pass'
+        :param on_shutdown: optional callable that is called when drain starts, should make the work finish soon
+        """
+        work = _TrackedWork(kind, asyncio.current_task(), on_shutdown)
+        self._work.append(work)
+        try:
+            yield
+        finally:
+            self._work.remove(work)
+
+    async def drain(self, timeout: float = 30.0) -> ShutdownReport:
+        """
+        Stops accepting new work and waits for the in-flight work to finish.
+        Calling it again returns the report of the first call.
+        :param timeout: float seconds to wait for in-flight work before cancelling it
+        :return: ShutdownReport
+        """
+        if self.report is not None:
+            return self.report
+        self.shutting_down = True
+        start = asyncio.get_running_loop().time()
+        current_task = asyncio.current_task()
+        # Work tracked by the task that is draining can't finish before drain returns so don't wait for it
+        pending = [work for work in self._work if work.task is not current_task]
+        logger.info(f"Shutting down, draining {len(pending)} in-flight task(s)..")
+
+        for work in pending:
+            if work.on_shutdown is not None:
+                try:
+                    work.on_shutdown()
+                except Exception as e:
+                    logger.warning(f"on_shutdown callback for {work.kind} failed: {e}")
+
+        drained, abandoned = Counter(), Counter()
+        if pending:
+            done, not_done = await asyncio.wait({work.task for work in pending}, timeout=timeout)
+            for work in pending:
+                if work.task in done:
+                    drained[work.kind] += 1
+                else:
+                    abandoned[work.kind] += 1
+                    work.task.cancel()
+
+        self.report = ShutdownReport(dict(drained), dict(abandoned), asyncio.get_running_loop().time() - start)
+        logger.info(f"Shutdown drain done. {self.report}")
+        self._save_checkpoint()
+        self._flush_logs()
+        return self.report
+
+    def _save_checkpoint(self):
+        checkpoint = {"time": str(get_current_time()), **self.report.to_dict()}
+        try:
+            with open(self.CHECKPOINT_PATH, "w") as f:
+                json.dump(checkpoint, f, indent=4)
+        except OSError as e:
+            logger.error(f"Can't save shutdown checkpoint: {e}")
+
+    @classmethod
+    def load_checkpoint(cls) -> Optional[dict]:
+        """
+        Loads and removes the checkpoint saved by the previous shutdown.
+        :return: dict checkpoint or None if there was no checkpoint (first run or previous shutdown was not graceful)
+        """
+        try:
+            with open(cls.CHECKPOINT_PATH) as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            logger.warning("No shutdown checkpoint found, previous shutdown was not graceful (or this is first run).")
+            return None
+        except ValueError as e:
+            logger.error(f"Invalid shutdown checkpoint: {e}")
+            checkpoint = None
+        cls.CHECKPOINT_PATH.unlink(missing_ok=True)
+        if checkpoint is not None and checkpoint["abandoned"]:
+            logger.warning(f"Previous shutdown at {checkpoint['time']} abandoned work: {checkpoint['abandoned']}")
+        return checkpoint
+
+    @staticmethod
+    def _flush_logs():
+        for handler in logging.getLogger().handlers:
+            handler.flush()
@@ -0,0 +1,102 @@
+import sys
+import time
+import builtins
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """
+    Measures where the startup time goes.
+    Import tracking wraps builtins.__import__ and records the inclusive time (including nested imports)
+    of every module that was imported for the first time while tracking was active.
+    Extension tracking records load time of every extension from startup_extensions.
+    Timeline records start offset and duration of every measured startup step (extension loads,
+    warm ups, cache loading..) so it's visible what dominates cold start, even when steps run concurrently.
+    Import tracking is meant to be active only during startup, call stop_import_tracking once the bot is loaded.
+    """
+
+    def __init__(self):
+        self.module_times: Dict[str, float] = {}
+        self.extension_times: Dict[str, float] = {}
+        # (label, start offset, duration) all in seconds
+        self.timeline: List[Tuple[str, float, float]] = []
+        self._original_import = None
+        self._start_time = time.perf_counter()
+
+    def start_import_tracking(self):
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop_import_tracking(self):
+        if self._original_import is None:
+            return
+        builtins.__import__ = self._original_import
+        self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Relative and already loaded imports are cheap and would only add noise
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.module_times.setdefault(name, time.perf_counter() - start)
+
+    @contextmanager
+    def measure(self, label: str):
+        """Records the duration of the with block as a timeline step."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timeline.append((label, start - self._start_time, time.perf_counter() - start))
+
+    @contextmanager
+    def measure_extension(self, extension_name: str):
+        with self.measure(f"load {extension_name}"):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.extension_times[extension_name] = time.perf_counter() - start
+
+    def mark(self, label: str):
+        """Records a zero duration timeline step, example when the bot becomes ready."""
+        self.timeline.append((label, self.elapsed(), 0.0))
+
+    def elapsed(self) -> float:
+        """:return: float seconds since the profiler was created"""
+        return time.perf_counter() - self._start_time
+
+    def report(self, top_modules: int = 15) -> str:
+        """
+        :param top_modules: how many of the slowest module imports to show
+        :return: str multi-line human readable report
+        """
+        lines = [f"Startup profile ({self.elapsed() * 1000:.0f}ms since start):"]
+        lines.append(f"Slowest imports (inclusive), {len(self.module_times)} tracked:")
+        slowest = sorted(self.module_times.items(), key=lambda item: item[1], reverse=True)[:top_modules]
+        for module_name, seconds in slowest:
+            lines.append(f"\t{seconds * 1000:8.1f}ms  {module_name}")
+        lines.append("Extension load times:")
+        for extension_name, seconds in self.extension_times.items():
+            lines.append(f"\t{seconds * 1000:8.1f}ms  {extension_name}")
+        return "\n".join(lines)
+
+    def timeline_report(self) -> str:
+        """
+        :return: str multi-line report of all timeline steps ordered by start time,
+                 each line is: start offset, duration and label
+        """
+        lines = ["Startup timeline (start / duration):"]
+        for label, start, duration in sorted(self.timeline, key=lambda step: step[1]):
+            lines.append(f"\t{start * 1000:8.1f}ms {duration * 1000:8.1f}ms  {label}")
+        return "\n".join(lines)
@@ -0,0 +1,70 @@
+from typing import Iterable, Iterator, Sequence
+
+_ALIGNMENTS = {"l": "<", "c": "^", "r": ">"}
+_TRUNCATION_MARK = ".."
+
+
+class Table:
+    """
+    Fast monospaced table renderer for columns with known, fixed widths.
+    Replaces texttable on command hot paths, texttable measures and wraps every cell
+    while here all the formatting is precomputed once and every row is a single str.format call.
+    Values longer than their column are truncated instead of wrapped so every row is exactly one line.
+
+    Output looks like:
+    +---------+-----+
+    | License | Dur |
+    +=========+=====+
+    | abc     | 720 |
+    +---------+-----+
+    """
+
+    def __init__(self, header: Sequence[str], widths: Sequence[int], align: str = None):
+        """
+        :param header: column names
+        :param widths: int width of every column (content only, without padding and borders)
+        :param align: str one char per column, l/c/r for left/center/right. Center by default.
+        """
+        if len(header) != len(widths):
+            raise ValueError("Header and widths need to have the same number of columns.")
+        align = align or "c" * len(widths)
+        self.widths = tuple(widths)
+        self._row_format = "| " + " | ".join(
+            f"{{:{_ALIGNMENTS[alignment]}{width}}}" for alignment, width in zip(align, widths)
+        ) + " |"
+        self._border = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+        header_separator = "+" + "+".join("=" * (width + 2) for width in widths) + "+"
+        self._header = "\n".join((self._border, self.format_row(header), header_separator))
+
+    @property
+    def line_length(self) -> int:
+        return len(self._border)
+
+    def _fit(self, value, width: int) -> str:
+        value = str(value)
+        if len(value) > width:
+            return value[:width - len(_TRUNCATION_MARK)] + _TRUNCATION_MARK
+        return value
+
+    def format_row(self, row: Sequence) -> str:
+        return self._row_format.format(*(self._fit(value, width) for value, width in zip(row, self.widths)))
+
+    def iter_lines(self, rows: Iterable[Sequence]) -> Iterator[str]:
+        """Streams the table line by line, rows can be a lazy iterable."""
+        yield from self._header.split("\n")
+        for row in rows:
+            yield self.format_row(row)
+        yield self._border
+
+    def draw(self, rows: Iterable[Sequence]) -> str:
+        return "\n".join(self.iter_lines(rows))
+
+    def rows_fitting(self, max_length: int) -> int:
+        """
+        Since every line has the same length it's known upfront how many rows fit in a message.
+        :param max_length: int maximum length of drawn table
+        :return: int number of rows that fit, at least 1
+        """
+        line = self.line_length + 1
+        # Header is 3 lines and there is a bottom border line
+        return max((max_length - 4 * line) // line, 1)
@@ -0,0 +1,103 @@
+"""
+Compares time_string_to_hours against the previous relativedelta implementation on seeded random
+duration strings, counted from month ends and leap days where month lengths matter the most.
+"""
+import random
+import datetime
+import types
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from discord.ext import commands
+
+from helpers import converters
+
+_SEEDS = range(20)
+_STRINGS_PER_SEED = 50
+
+_START_DATES = (
+    datetime.datetime(2023, 1, 31, 13, 45, 12),
+    datetime.datetime(2023, 2, 28, 23, 59, 59),
+    datetime.datetime(2023, 3, 31, 0, 0, 0),
+    datetime.datetime(2023, 4, 30, 7, 30, 0),
+    datetime.datetime(2023, 8, 31, 18, 5, 1),
+    datetime.datetime(2023, 12, 31, 22, 10, 0),
+    datetime.datetime(2024, 1, 31, 11, 0, 0),
+    # Leap days, 1900 and 2100 are not leap years
+    datetime.datetime(2024, 2, 29, 12, 0, 0),
+    datetime.datetime(2020, 2, 29, 0, 0, 1),
+    datetime.datetime(2000, 2, 29, 6, 6, 6),
+    datetime.datetime(1900, 2, 28, 12, 0, 0),
+    datetime.datetime(2100, 2, 28, 12, 0, 0),
+    datetime.datetime(2023, 6, 15, 9, 0, 0),
+)
+
+# (group, max digits, suffixes) in the order they have to appear in a word
+_WORD_PARTS = (
+    ("years", 1, ("y", "year", "years")),
+    ("months", 2, ("m", "month", "months")),
+    ("weeks", 4, ("w", "week", "weeks")),
+    ("days", 5, ("d", "day", "days")),
+    ("hours", 5, ("h", "hour", "hours")),
+)
+
+
+def reference_time_string_to_hours(str_input: str, now: datetime.datetime) -> int:
+    """Previous implementation, each word is a relativedelta added to now."""
+    hours = 0
+    for word in str_input.split():
+        match = converters._TIME_WORD.fullmatch(word)
+        if match is None or not match.group(0):
+            raise commands.BadArgument("Invalid time provided.")
+        time_data = {k: int(v) for k, v in match.groupdict(default=0).items()}
+        td = (relativedelta(**time_data) + now) - now
+        hours += td.days * 24 + td.seconds // 3600
+    return hours
+
+
+def random_word(rng: random.Random) -> str:
+    parts = [part for part in _WORD_PARTS if rng.random() < 0.4] or [rng.choice(_WORD_PARTS)]
+    return "".join(
+        f"{rng.randint(0, 10 ** rng.randint(1, max_digits) - 1)}{rng.choice(suffixes)}"
+        for _, max_digits, suffixes in parts
+    )
+
+
+def random_time_string(rng: random.Random) -> str:
+    return " ".join(random_word(rng) for _ in range(rng.randint(1, 4)))
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Sets the UTC now converters see, returns function taking the datetime."""
+    def freeze(now: datetime.datetime):
+        frozen_datetime = type("FrozenDatetime", (datetime.datetime,), {"utcnow": classmethod(lambda cls: now)})
+        monkeypatch.setattr(converters, "datetime", types.SimpleNamespace(datetime=frozen_datetime,
+                                                                           date=datetime.date))
+    return freeze
+
+
+@pytest.mark.parametrize("start", _START_DATES, ids=str)
+@pytest.mark.parametrize("seed", _SEEDS)
+def test_matches_relativedelta(frozen_now, start, seed):
+    frozen_now(start)
+    rng = random.Random(seed)
+    for _ in range(_STRINGS_PER_SEED):
+        time_string = random_time_string(rng)
+        assert converters.time_string_to_hours(time_string) == reference_time_string_to_hours(time_string, start), \
+            time_string
+
+
+@pytest.mark.parametrize("start", _START_DATES, ids=str)
+def test_every_month_count(frozen_now, start):
+    frozen_now(start)
+    for years in range(10):
+        for months in range(100):
+            time_string = f"{years}y{months}m"
+            assert converters.time_string_to_hours(time_string) == reference_time_string_to_hours(time_string, start)
+
+
+@pytest.mark.parametrize("time_string", ("5", "y", "3x", "1m2y", "10y", "100m", "1h2d", "5 hours"))
+def test_invalid(time_string):
+    with pytest.raises(commands.BadArgument):
+        converters.time_string_to_hours(time_string)